@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""Level.random generation time across floor sizes.
+
+python benchmarks/bench_generate.py [SIZE ...]
+"""
+from pathlib import Path
+import random
+import sys
+import time
+
+# Setup import path
+sys.path[:0] = [str(Path(__file__).parent.parent / "src")]
+
+import game  # noqa
+from world import Level  # noqa
+
+
+def bench(width: int, height: int) -> None:
+    rng = random.Random(width * height)
+    t0 = time.perf_counter()
+    Level.random(width, height, rng)
+    elapsed = time.perf_counter() - t0
+    cells = width * height
+    print(
+        f"{width:>5}x{height:<5} {elapsed:8.3f}s | "
+        f"{cells / elapsed / 1e3:7.1f}k cells/s"
+    )
+
+
+if __name__ == "__main__":
+    bench(24, 15)  # The default size
+    for arg in sys.argv[1:] or ["100", "300", "1000", "2000"]:
+        bench(int(arg), int(arg))
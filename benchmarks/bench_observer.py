@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""Attribute set throughput on Observable objects.
+
+python benchmarks/bench_observer.py [COUNT]
+"""
+from pathlib import Path
+import random
+import sys
+import timeit
+from typing import Any
+
+# Setup import path
+sys.path[:0] = [str(Path(__file__).parent.parent / "src")]
+
+import game  # noqa
+import observer  # noqa
+from world import Level  # noqa
+
+
+class Listener:
+    def notify(self, obj: observer.Observable, msg: observer.Message) -> None:
+        pass
+
+
+def bench(label: str, count: int, statement: str, **names: Any) -> None:
+    elapsed = timeit.timeit(statement, number=count, globals=names)
+    observer.dispatch_events()
+    print(f"{label:<36} {count / elapsed / 1e6:6.2f}M sets/s")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    g = game.Game(seed=0)
+    hero = g.hero
+    room = Level.random(rng=random.Random(0)).room(3, 3)
+
+    hero.unregister(g)
+    bench("plain attribute", count, "hero.previous_room = room", hero=hero, room=room)
+    bench("observable field, not observed", count, "hero.damage = 0", hero=hero)
+    bench("observable property, not observed", count, "room.seen = 1", room=room)
+    hero.register(Listener())
+    room.register(Listener())
+    bench("observable field, observed", count, "hero.damage = 0", hero=hero)
+    bench("observable property, observed", count, "room.seen = 1", room=room)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Parsing time of .map files, against the previous cell by cell parser.
+
+python benchmarks/bench_parse.py [SIZE ...]
+
+Maps of SIZE x SIZE rooms are written from random levels into a temporary
+directory. Both parsers must produce the same level.
+"""
+from pathlib import Path
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+# Setup import path
+sys.path[:0] = [str(Path(__file__).parent.parent / "src")]
+
+import game  # noqa
+import store  # noqa
+import trap  # noqa
+import treasure  # noqa
+from world import BIT, DX, DY, DOOR_TRAP_PROBABILITY, Level, Room  # noqa
+
+
+def to_map(level: Level) -> str:
+    """The text of a .map file describing `level`"""
+    st = level.store
+    lines = []
+    for y in range(st.height):
+        north = ["+"]
+        middle = ["|"]
+        for x in range(st.width):
+            cell = st.cell(x, y)
+            north.append(" " if st.exits[cell] & BIT[0] else "-")
+            north.append("+")
+            if cell == level.entrance.cell:
+                c = "<"
+            elif cell == level.exit.cell:
+                c = ">"
+            elif st.terrain[cell]:
+                c = "#" if st.terrain[cell] == store.DOOR else "S"
+            elif st.traps[cell]:
+                c = "^"
+            elif st.monsters[cell]:
+                c = "M"
+            elif st.loot[cell]:
+                c = "$"
+            else:
+                c = " "
+            middle.append(c)
+            middle.append(" " if st.exits[cell] & BIT[2] else "|")
+        lines.append("".join(north))
+        lines.append("".join(middle))
+    lines.append("+-" * st.width + "+")
+    return "\n".join(lines) + "\n"
+
+
+def legacy_parse(level: Level, lines: List[str], rng: random.Random) -> None:
+    """The parser Level used before, visiting each cell and wall in Python"""
+    st = level.store
+    exit: Optional[Room] = None
+    level.entrance = level.room(0, 0)
+    for x in range(st.width):
+        rx = 2 * x + 1
+        for y in range(st.height):
+            ry = 2 * y + 1
+            cell = st.cell(x, y)
+            for i, bit in enumerate(BIT):
+                if lines[ry + DY[i]][rx + DX[i]] == " ":
+                    st.exits[cell] |= bit
+            terrain = lines[ry][rx]
+            if terrain in "#S":
+                st.terrain[cell] = store.DOOR if terrain == "#" else store.SECRET_DOOR
+                if rng.random() <= DOOR_TRAP_PROBABILITY:
+                    st.traps[cell] = trap.encode(trap.random_kind(rng))
+                level.room(x, y).validate()
+            elif terrain == "<":
+                level.entrance = level.room(x, y)
+            elif terrain == ">":
+                exit = level.room(x, y)
+            elif terrain == " ":
+                pass
+            elif terrain == "^":
+                st.traps[cell] = trap.encode(trap.random_kind(rng))
+            elif terrain == "M":
+                st.monsters[cell] = 1
+            elif terrain == "$":
+                st.loot[cell] = treasure.encode(treasure.random_kind(rng))
+            else:
+                raise ValueError(
+                    f"line {ry+1} char {rx+1}: unknown room type {terrain!r}"
+                )
+    assert exit is not None
+    level.exit = exit
+
+
+def bench(size: int) -> None:
+    with open(f"maps/bench{size}.map", "w") as f:
+        f.write(to_map(Level.random(size, size, random.Random(size))))
+
+    t0 = time.perf_counter()
+    level = Level(f"bench{size}", random.Random(0))
+    new = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with open(f"maps/bench{size}.map") as f:
+        lines = f.readlines()
+    old_level: Level = object.__new__(Level)
+    old_level._setup(store.LevelStore(size, size))
+    legacy_parse(old_level, lines, random.Random(0))
+    old = time.perf_counter() - t0
+
+    assert level.to_bytes() == old_level.to_bytes(), "parsers disagree"
+    print(
+        f"{size:>5}x{size:<5} legacy {old:8.3f}s | new {new:8.3f}s | "
+        f"{old / new:5.1f}x faster"
+    )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.mkdir("maps")
+        for arg in sys.argv[1:] or ["100", "300", "1000"]:
+            bench(int(arg))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Memory and traversal speed of Room objects on large generated levels.
+
+python benchmarks/bench_rooms.py [SIZE ...]
+"""
+from pathlib import Path
+import random
+import sys
+import time
+import tracemalloc
+
+# Setup import path
+sys.path[:0] = [str(Path(__file__).parent.parent / "src")]
+
+import game  # noqa
+from world import BIT, Direction, Level  # noqa
+
+
+def bench(size: int) -> None:
+    rng = random.Random(size)
+    t0 = time.perf_counter()
+    level = Level.random(size, size, rng)
+    generate = time.perf_counter() - t0
+
+    tracemalloc.start()
+    rooms = [level.room(x, y) for y in range(size) for x in range(size)]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Flood fill through neighbors, like MapController.show_map
+    t0 = time.perf_counter()
+    shown = set()
+    pending = [level.entrance]
+    while pending:
+        room = pending.pop()
+        shown.add(room)
+        for n in room.neighbors.values():
+            if n not in shown:
+                pending.append(n)
+    flood = time.perf_counter() - t0
+
+    # Straight rays from every room, like Game.look
+    t0 = time.perf_counter()
+    steps = 0
+    for start in rooms:
+        for d in Direction:
+            room = start
+            while room.allows_sight and d in room.neighbors:
+                room = room.neighbors[d]
+                steps += 1
+    rays = time.perf_counter() - t0
+
+    # Same, with the integer direction encoding used by Game.look
+    t0 = time.perf_counter()
+    for start in rooms:
+        for i, bit in enumerate(BIT):
+            room = start
+            while room.allows_sight and room.exits & bit:
+                room = room.neighbor(i)
+    int_rays = time.perf_counter() - t0
+
+    print(
+        f"{size:>5}x{size:<5} generate {generate:7.3f}s | "
+        f"{memory / len(rooms):6.0f} bytes/room | "
+        f"flood {len(rooms) / flood / 1e3:7.1f}k rooms/s | "
+        f"rays {steps / rays / 1e6:5.2f}M steps/s "
+        f"({steps / int_rays / 1e6:5.2f}M with ints)"
+    )
+
+
+if __name__ == "__main__":
+    for arg in sys.argv[1:] or ["50", "100", "200"]:
+        bench(int(arg))
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""Build a pack of pre-generated floors; see `python build_pack.py --help`"""
+from pathlib import Path
+import sys
+
+# Setup import path
+runner_dir = Path(__file__).parent
+sys.path[:0] = [str(runner_dir / "src")]
+
+import levelpack  # noqa
+
+if __name__ == "__main__":
+    levelpack.main()
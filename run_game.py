@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
+import argparse
 from pathlib import Path
 import os
+import random
 import sys
 
 # Setup import path
@@ -11,6 +13,12 @@ sys.path[:0] = [str(runner_dir / "src")]
 
 from ui import UI  # noqa
 from controllers.intro import IntroController  # noqa
+from controllers.map import MapController  # noqa
+from effects import Wasabi2dEffects  # noqa
+import game  # noqa
+from levelpack import LevelPack  # noqa
+import savegame  # noqa
+import world  # noqa
 
 if __name__ == "__main__":
     # Check dependencies
@@ -31,6 +39,54 @@ if __name__ == "__main__":
     except ImportError:
         print("run: pip install dataclasses")
 
+    parser = argparse.ArgumentParser(description="Play Spire of Chaos")
+    parser.add_argument(
+        "--pack", metavar="FILE", help="take floors from a level pack (build_pack.py)"
+    )
+    parser.add_argument(
+        "--endless", action="store_true", help="endless spire, with no top floor"
+    )
+    parser.add_argument(
+        "--tower",
+        type=int,
+        help="use the floors of this tower in the pack (default: a random one)",
+    )
+    parser.add_argument(
+        "--continue",
+        dest="resume",
+        action="store_true",
+        help="continue the last game, which is saved as you play",
+    )
+    args = parser.parse_args()
+    if args.endless and args.pack:
+        parser.error("an endless spire can't use a level pack")
+
     # Run game
-    UI.push(IntroController())
+    world.ENDLESS = args.endless
+    savegame.AUTOSAVE_FILE = str(runner_dir / savegame.AUTOSAVE_FILE)
+    saved = None
+    if args.resume:
+        if not os.path.exists(savegame.AUTOSAVE_FILE):
+            print("There is no game to continue, starting a new one")
+        else:
+            try:
+                saved = savegame.load(savegame.AUTOSAVE_FILE, effects=Wasabi2dEffects())
+            except (OSError, ValueError) as e:
+                print(f"Can't continue the last game ({e}), starting a new one")
+    prepared = None
+    if args.pack:
+        pack = LevelPack(args.pack)
+        if len(pack) < world.FLOORS:
+            parser.error(f"{args.pack} has less than {world.FLOORS} floors")
+        towers = len(pack) // world.FLOORS
+        tower = args.tower
+        if tower is None:
+            tower = random.randrange(towers)
+        elif not 0 <= tower < towers:
+            parser.error(f"{args.pack} has towers 0 to {towers - 1}")
+        prepared = game.prepare_world(pack, first=tower * world.FLOORS)
+    if saved is not None:
+        UI.push(MapController(saved=saved))
+    else:
+        UI.push(IntroController(world=prepared))
     UI.run()
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""Play action logs again headless; see `python run_replay.py --help`"""
+from pathlib import Path
+import sys
+
+# Setup import path
+runner_dir = Path(__file__).parent
+sys.path[:0] = [str(runner_dir / "src")]
+
+import replay  # noqa
+
+if __name__ == "__main__":
+    replay.main()
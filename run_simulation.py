@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""Play many headless games in parallel; see `python run_simulation.py --help`"""
+from pathlib import Path
+import sys
+
+# Setup import path
+runner_dir = Path(__file__).parent
+sys.path[:0] = [str(runner_dir / "src")]
+
+import simulation  # noqa
+
+if __name__ == "__main__":
+    simulation.main()
@@ -1,8 +1,13 @@
+from concurrent.futures import Future
+from typing import Optional
+
 from wasabi2d import keys, keymods, music
 
 from controllers.map import MapController
+import game
 from hudscene import HUDScene
 from ui import UI
+from world import World
 
 intro_text = [
     """
@@ -41,13 +46,23 @@ INTRO_LAYER = 100
 
 
 class IntroController:
+    world: "Optional[Future[World]]"
+
     def __init__(
-        self, stage: int = 0, track: str = "intro", intro: bool = True
+        self,
+        stage: int = 0,
+        track: str = "intro",
+        intro: bool = True,
+        world: "Optional[Future[World]]" = None,
     ) -> None:
         self.stage = stage
         self.is_intro = intro
         if stage == 0:
             music.play_once(track)
+        self.world = world
+        if intro and world is None:
+            # Build the world while the player reads the intro
+            self.world = game.prepare_world()
 
     def activate(self, scene: HUDScene) -> None:
         size = 20
@@ -82,8 +97,11 @@ class IntroController:
         if key in (keys.ESCAPE, keys.SPACE):
             next_stage = self.stage + 1
             if next_stage < len(intro_text):
-                UI.replace(self, IntroController(next_stage, intro=self.is_intro))
+                UI.replace(
+                    self,
+                    IntroController(next_stage, intro=self.is_intro, world=self.world),
+                )
             elif self.is_intro:
-                UI.replace(self, MapController())
+                UI.replace(self, MapController(self.world))
             else:
                 UI.pop()
@@ -1,53 +1,118 @@
-from typing import List
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
 
-from wasabi2d import keys, keymods
-from wasabi2d import music
+from wasabi2d import clock, keys, keymods
 
 import controllers.intro
 from controllers.message import MessageController
 from controllers.menu import MenuController
+from effects import Wasabi2dEffects
 import game
 from hudscene import HUDScene
 from observer import Observable, Message
+import replay
+import savegame
 from ui import UI, Controller
 import world
-from views.room import RoomView
+from views.dimensions import ROOM_SPACING, SCREEN_HEIGHT, SCREEN_WIDTH
+from views.layer_ids import FLOOR_LAYER
+from views.level import LevelView
 from views.game_info import GameInfoView
 from views.hero import HeroView, HitPointView, StatsView
 
+# Rooms kept around the edges of the screen, so the camera never pans into gaps
+VIEW_MARGIN = 2
+# Rooms shown at each side of the hero
+HALF_COLUMNS = SCREEN_WIDTH // (2 * ROOM_SPACING) + VIEW_MARGIN
+HALF_ROWS = SCREEN_HEIGHT // (2 * ROOM_SPACING) + VIEW_MARGIN
+# Floors kept rendered (but hidden) after leaving them, for quick returns;
+# only live floors can be shown again (see drop_compacted). Each one has its
+# own layer, from FLOOR_LAYER up
+FLOOR_CACHE = world.LIVE_FLOORS
+AUTOSAVE_INTERVAL = 1.0  # Seconds between autosaves
+# Player actions (see replay.ACTIONS) by key
+KEY_ACTIONS = {
+    keys.RIGHT: "east",
+    keys.UP: "north",
+    keys.LEFT: "west",
+    keys.DOWN: "south",
+    keys.S: "search",
+    keys.R: "rest",
+    keys.I: "inventory",
+    keys.T: "travel",
+    keys.X: "explore",
+}
+
 
 class MapController:
-    def __init__(self) -> None:
-        self.game = game.Game()
+    def __init__(
+        self,
+        world: "Optional[Future[world.World]]" = None,
+        saved: Optional[game.Game] = None,
+    ) -> None:
+        """Start a new game, or continue `saved` (see savegame.load)"""
+        resume = saved is not None
+        if saved is not None:
+            self.game = saved
+        else:
+            self.game = game.Game(
+                effects=Wasabi2dEffects(),
+                # Waits for the world if it's still being generated
+                world=world.result() if world is not None else None,
+            )
         self.game.register(self)
-        self.rooms: List[RoomView] = []
+        self.game.hero.register(self, fields={"room"})
+        self.autosave = savegame.Autosave(self.game, savegame.AUTOSAVE_FILE)
+        clock.schedule_interval(self.autosave.flush, AUTOSAVE_INTERVAL)
+        self.recorder: Optional[replay.Recorder] = None
+        if resume:
+            # Bring back the menus of the room, which weren't saved
+            self.game.visit_room()
+        else:
+            # Resumed games can't be logged, they don't start from the seeds
+            self.recorder = replay.Recorder(self.game, replay.LOG_FILE)
+        # Views of the recently shown floors, the current one first
+        self.levels: List[LevelView] = []
 
     def activate(self, scene: HUDScene) -> None:
         self.scene = scene
         scene.camera.pos = (0, 0)
+        self.levels = [
+            LevelView(
+                scene.layers[FLOOR_LAYER + i], 2 * HALF_COLUMNS + 1, 2 * HALF_ROWS + 1
+            )
+            for i in range(FLOOR_CACHE)
+        ]
         self.show_map()
         self.show_hero()
         self.show_hud()
 
     def deactivate(self, scene: HUDScene) -> None:
-        pass
+        # Closed once the game is over; quitting the program meanwhile is
+        # handled by the autosave itself
+        clock.unschedule(self.autosave.flush)
+        self.autosave.close()
 
     def show_map(self) -> None:
-        shown_rooms = set()
         level = self.game.hero.room.level
-        pending_rooms = [level.entrance]
-        while pending_rooms:
-            room = pending_rooms.pop(-1)
-            shown_rooms.add(room)
-            rv = RoomView(self.scene, room)
-            self.rooms.append(rv)
-
-            for n in room.neighbors.values():
-                if n not in shown_rooms:
-                    pending_rooms.append(n)
+        for shown in self.levels:
+            if shown.level is level:
+                break
+        else:
+            # Not cached, reuse a cleared view or the least recently shown floor
+            shown = next(
+                (lv for lv in self.levels if lv.level is None), self.levels[-1]
+            )
+            shown.clear()
+            shown.level = level
+        self.levels.remove(shown)
+        self.levels.insert(0, shown)
+        for lv in self.levels:
+            lv.visible = lv is shown
+        self.update_viewport()
         # Play level music
         try:
-            music.play(
+            self.game.effects.play_music(
                 "level"
                 + str(self.game.world.level_number(self.game.hero.room.level) + 1)
             )
@@ -56,11 +121,39 @@ class MapController:
             print("Can not play music!")
             pass
 
-    def clear_map(self) -> None:
-        for rv in self.rooms:
-            rv.release()
-        RoomView.clear_layers(self.scene)
-        self.rooms = []
+    def viewport(self) -> Tuple[range, range]:
+        """Columns and rows of the rooms that the camera may show.
+
+        The camera follows the hero (see HeroView), so this is a screen
+        around the hero room, plus VIEW_MARGIN. Keep it in sync with the
+        floor mesh window.
+        """
+        pc = self.game.hero
+        level = pc.room.level
+        return (
+            range(
+                max(pc.x - HALF_COLUMNS, 0), min(pc.x + HALF_COLUMNS + 1, level.width)
+            ),
+            range(max(pc.y - HALF_ROWS, 0), min(pc.y + HALF_ROWS + 1, level.height)),
+        )
+
+    def drop_compacted(self) -> None:
+        """Clear the views of floors the world compacted.
+
+        A compacted floor comes back as a new Level, so those views would
+        never be shown again, and their rooms are no longer in the game.
+        """
+        for lv in self.levels:
+            if lv.level is not None and not self.game.world.is_live(lv.level):
+                lv.clear()
+
+    def update_viewport(self) -> None:
+        """Follow the hero, to another floor if needed"""
+        self.drop_compacted()
+        if self.game.hero.room.level is not self.levels[0].level:
+            self.show_map()
+        else:
+            self.levels[0].show(*self.viewport())
 
     def show_hero(self) -> None:
         HeroView(self.scene, self.game.hero)
@@ -71,22 +164,18 @@ class MapController:
         StatsView(self.scene, self.game.hero)
 
     def on_key_down(self, key: keys, mod: keymods) -> None:
-        if key == keys.RIGHT:
-            self.game.move(world.Direction.EAST)
-        elif key == keys.UP:
-            self.game.move(world.Direction.NORTH)
-        elif key == keys.LEFT:
-            self.game.move(world.Direction.WEST)
-        elif key == keys.DOWN:
-            self.game.move(world.Direction.SOUTH)
-        elif key == keys.S:
-            self.game.search()
-        elif key == keys.R:
-            self.game.rest()
-        elif key == keys.I:
-            self.game.inventory()
+        action = KEY_ACTIONS.get(key)
+        if action is not None:
+            if self.recorder is not None:
+                self.recorder.record(action)
+            replay.ACTIONS[action](self.game)
 
     def notify(self, obj: Observable, msg: Message) -> None:
+        if obj is self.game.hero:
+            # The hero moved, and the camera with it
+            if self.levels:
+                self.update_viewport()
+            return
         if "events" in msg:
             # Handle game events
             events = reversed(self.game.pop_events())
@@ -95,9 +184,14 @@ class MapController:
             for i, menu in enumerate(events):
                 c: Controller
                 if not menu.entries:
-                    c = MessageController(menu.title, subtitle=menu.subtitle, offset=i)
+                    c = MessageController(
+                        menu.title,
+                        subtitle=menu.subtitle,
+                        offset=i,
+                        recorder=self.recorder,
+                    )
                 else:
-                    c = MenuController(menu, offset=i)
+                    c = MenuController(menu, offset=i, recorder=self.recorder)
                 UI.push(c)
         if "win" in msg:
             if self.game.win is not None:
@@ -106,8 +200,7 @@ class MapController:
                 else:
                     self.lose()
         if "current_level" in msg:
-            self.clear_map()
-            self.show_map()
+            self.update_viewport()
 
     def win(self) -> None:
         controllers.intro.intro_text = [
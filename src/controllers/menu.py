@@ -1,7 +1,10 @@
+from typing import Optional
+
 from wasabi2d import keys, keymods
 
 from hudscene import HUDScene
 from menu import Menu
+import replay
 from ui import UI
 from views.layer_ids import DIALOG_LAYER
 from views.dimensions import SCREEN_WIDTH
@@ -14,8 +17,11 @@ BORDER_COLOR = "#7777aaff"
 
 
 class MenuController:
-    def __init__(self, menu: Menu, offset: int = 0):
+    def __init__(
+        self, menu: Menu, offset: int = 0, recorder: Optional[replay.Recorder] = None
+    ):
         self.menu = menu
+        self.recorder = recorder
         self.action_map = {keys[e.key]: e.action for e in menu.entries}  # type: ignore
         self.action_map[keys.ESCAPE] = menu.cancel  # type: ignore
         self.layer = DIALOG_LAYER + offset
@@ -62,5 +68,11 @@ class MenuController:
 
     def on_key_down(self, key: keys, mod: keymods) -> None:
         if key in self.action_map:
+            if self.recorder is not None:
+                self.recorder.record(
+                    replay.CANCEL
+                    if key == keys.ESCAPE
+                    else f"{replay.CHOOSE} {key.name}"
+                )
             self.action_map[key]()
             UI.pop()
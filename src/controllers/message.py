@@ -1,7 +1,10 @@
+from typing import Optional
+
 from wasabi2d import keys
 from wasabi2d import keymods
 
 from hudscene import HUDScene
+import replay
 from ui import UI
 from views.layer_ids import DIALOG_LAYER
 from views.dimensions import SCREEN_WIDTH
@@ -12,8 +15,15 @@ BORDER_COLOR = "#7777aaff"
 
 
 class MessageController:
-    def __init__(self, text: str, subtitle: str = "", offset: int = 0):
+    def __init__(
+        self,
+        text: str,
+        subtitle: str = "",
+        offset: int = 0,
+        recorder: Optional[replay.Recorder] = None,
+    ):
         self.text = text
+        self.recorder = recorder
         self.subtitle = subtitle
         self.layer = DIALOG_LAYER + offset
 
@@ -42,4 +52,6 @@ class MessageController:
 
     def on_key_down(self, key: keys, mod: keymods) -> None:
         # Any key closes
+        if self.recorder is not None:
+            self.recorder.record(replay.CLOSE)
         UI.pop()
@@ -0,0 +1,63 @@
+from typing import List, Tuple
+from typing_extensions import Protocol
+
+
+class Effects(Protocol):
+    """Backend for the audiovisual side effects triggered by game logic.
+
+    The game never talks to the audio stack directly, so it can run headless
+    with one of the non-wasabi2d backends below.
+    """
+
+    def play_sound(self, name: str) -> None:
+        ...
+
+    def play_music(self, track: str, once: bool = False) -> None:
+        ...
+
+
+class NullEffects:
+    """Ignore all effects (for headless games)"""
+
+    def play_sound(self, name: str) -> None:
+        pass
+
+    def play_music(self, track: str, once: bool = False) -> None:
+        pass
+
+
+class RecordingEffects:
+    """Keep a log of the effects requested, without playing anything"""
+
+    sounds: List[str]
+    music: List[Tuple[str, bool]]
+
+    def __init__(self) -> None:
+        self.sounds = []
+        self.music = []
+
+    def play_sound(self, name: str) -> None:
+        self.sounds.append(name)
+
+    def play_music(self, track: str, once: bool = False) -> None:
+        self.music.append((track, once))
+
+
+class Wasabi2dEffects:
+    """Play effects through wasabi2d. Requires the full GL/audio stack"""
+
+    def __init__(self) -> None:
+        # Imported here so the rest of this module works without wasabi2d
+        from wasabi2d import music, sounds
+
+        self._music = music
+        self._sounds = sounds
+
+    def play_sound(self, name: str) -> None:
+        getattr(self._sounds, name).play()
+
+    def play_music(self, track: str, once: bool = False) -> None:
+        if once:
+            self._music.play_once(track)
+        else:
+            self._music.play(track)
@@ -1,15 +1,16 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
-import random
 from typing import Iterator, List, Optional
 
-from wasabi2d import sounds
-
+from effects import Effects, NullEffects
 import hero
+import levelpack
 from observer import Observable, Message
 from menu import Menu, MenuItem
-from world import World, Direction, Level
+import pathfinding
+from world import World, Direction, Level, Room, BIT
 import treasure
-from util import roll
+from util import GameRandom, roll
 
 
 class DamageType(Enum):
@@ -41,6 +42,20 @@ def key_iterator() -> Iterator[str]:
     )  # 'I' skipped for people coming from inventory
 
 
+_world_builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="world")
+
+
+def prepare_world(
+    pack: "Optional[levelpack.LevelPack]" = None, first: int = 0
+) -> "Future[World]":
+    """Start generating a World in the background.
+
+    The result can be passed on to Game() when it's needed; this lets the
+    UI hide generation time behind the intro.
+    """
+    return _world_builder.submit(World, pack=pack, first=first)
+
+
 class Game(Observable):
 
     OBSERVABLE_FIELDS = {"time", "win", "current_level"}
@@ -48,6 +63,8 @@ class Game(Observable):
     hero: hero.Hero
     world: World
     current_level: Level
+    effects: Effects
+    rng: GameRandom
 
     _time: int = 0
     MAX_TIME: int = 24 * 12 * 7  # 7 Days time limit
@@ -56,12 +73,24 @@ class Game(Observable):
 
     _events: List[Menu]
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        effects: Optional[Effects] = None,
+        world: Optional[World] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """A new game. The same `seed` (a random one if not given) plays the
+        same, and builds the same world if one isn't given"""
         super().__init__()
-        self.world = World()
+        # Headless by default; the interactive UI plugs in its own backend
+        self.effects = effects if effects is not None else NullEffects()
+        self.rng = GameRandom(seed)
+        if world is None:
+            world = World(seed=self.rng.generation.getrandbits(32))
+        self.world = world
         self.hero = hero.Hero(self.world)
         self.current_level = self.hero.room.level
-        self.hero.register(self)  # Look for the hero status
+        self.hero.register(self, fields={"hit_points"})  # Look for the hero status
         self._events = []
         self.look()
 
@@ -103,7 +132,7 @@ class Game(Observable):
     def search(self) -> None:
         self.time += SEARCH_TIME
         room = self.hero.room
-        check = self.hero.awareness.bonus + roll()
+        check = self.hero.awareness.bonus + roll(self.rng.combat)
         for nr in room.neighbors.values():
             nr.reveal_hidden(check)
         self.look()
@@ -134,8 +163,8 @@ class Game(Observable):
             # the only way out from a door, is away
             self.hero.retreat()
             return
-        if direction in room.neighbors:
-            new_room = room.neighbors[direction]
+        if room.exits & BIT[direction.index]:
+            new_room = room.neighbor(direction.index)
             if not new_room.visible:
                 # Hidden door; not moving
                 return
@@ -143,6 +172,61 @@ class Game(Observable):
             self.look()
             self.visit_room()
 
+    def travel(self, target: Room) -> None:
+        """Walk to `target` through the known rooms, in a single command.
+
+        Stops on the way when something needs the player's attention (a
+        monster, a door, a trap, some loot...)
+        """
+        field = pathfinding.distance_field(
+            self.current_level, target, self.hero.holds(pathfinding.KEY)
+        )
+        room = self.hero.room
+        if field.distance(room) is None:
+            self.add_message("You don't know a way there")
+            return
+        while room is not target and self.win is None and not self._events:
+            step = field.step(room)
+            if step is None:
+                break
+            self.move(step)
+            if self.hero.room is room:
+                break  # Couldn't move
+            room = self.hero.room
+
+    def travel_to_stairs(self) -> None:
+        """Travel to the stairs up, if they have been found"""
+        stairs = self.current_level.exit
+        if not stairs.seen:
+            self.add_message("You haven't found the stairs up yet")
+        elif self.hero.room is stairs:
+            self.visit_room()
+        else:
+            self.travel(stairs)
+
+    def explore(self) -> None:
+        """Walk to the closest unexplored places, in a single command.
+
+        Goes on until something needs the player's attention (the same
+        things that stop travel) or there's nothing left to explore.
+        """
+        level = self.current_level
+        while self.win is None and not self._events:
+            found = pathfinding.unexplored_route(
+                level, self.hero.room, self.hero.holds(pathfinding.KEY)
+            )
+            if found is None:
+                self.add_message("There's nothing else to explore here")
+                return
+            target, route = found
+            for d in route:
+                room = self.hero.room
+                self.move(d)
+                if self._events or self.hero.room is room or self.win is not None:
+                    return
+                if not pathfinding.borders_unexplored(target):
+                    break  # Seen all around it on the way, look for another
+
     def visit_room(self, **kwargs: str) -> None:
         """Trigger actions when reentering a room"""
         room = self.hero.room
@@ -298,19 +382,19 @@ class Game(Observable):
         monster = self.hero.room.monster
 
         self.time += FIGHT_TIME
-        check = self.hero.strength.bonus + roll() + bonus
+        check = self.hero.strength.bonus + roll(self.rng.combat) + bonus
         if check >= monster.ac:
             if bonus == 0:  # FIXME: this shouldn't know about the boots
-                sounds.fight.play()
+                self.effects.play_sound("fight")
             else:
-                sounds.kungfu.play()
-            if random.random() <= monster.drop_rate:
-                self.hero.room.loot = treasure.Item.random()
+                self.effects.play_sound("kungfu")
+            if self.rng.loot.random() <= monster.drop_rate:
+                self.hero.room.loot = treasure.Item.random(self.rng.loot)
                 self.visit_treasure("The monster dies and drops a {}")
             else:
                 self.add_message("You defeat the monster!")
         else:
-            sounds.roar.play()
+            self.effects.play_sound("roar")
             monster.attack(self)
         self.hero.room.monster = None
 
@@ -318,9 +402,9 @@ class Game(Observable):
         assert self.hero.room.monster
         monster = self.hero.room.monster
         self.time += ESCAPE_TIME
-        check = self.hero.agility.bonus + roll() + bonus
+        check = self.hero.agility.bonus + roll(self.rng.combat) + bonus
         if check < monster.escape_dc:
-            sounds.roar.play()
+            self.effects.play_sound("roar")
             monster.attack(self)
         self.hero.retreat()
 
@@ -365,9 +449,9 @@ class Game(Observable):
 
     def break_door(self, bonus: int = 0) -> None:
         self.time += BREAK_TIME
-        check = self.hero.strength.bonus + roll() + bonus
+        check = self.hero.strength.bonus + roll(self.rng.combat) + bonus
         assert self.hero.room.door
-        sounds.force.play()
+        self.effects.play_sound("force")
         if check >= self.hero.room.door.break_dc:
             self.hero.room.door = None
             if self.hero.room.trap:
@@ -387,7 +471,7 @@ class Game(Observable):
     def unlock_door(self, key: treasure.Item) -> None:
         self.time += UNLOCK_TIME
         self.hero.room.door = None
-        sounds.unlock.play()
+        self.effects.play_sound("unlock")
         if self.hero.room.trap:
             self.trigger_trap("As the door unlocks, a trap within it is triggered!")
             # The trap is destroyed with the door
@@ -401,7 +485,7 @@ class Game(Observable):
     def search_traps(self) -> None:
         """Search for traps within door"""
         self.time += SEARCH_TIME
-        check = self.hero.awareness.bonus + roll()
+        check = self.hero.awareness.bonus + roll(self.rng.combat)
         self.hero.room.reveal_traps(check)
         self.look()
         if self.hero.room.trap is None or self.hero.room.trap.hide_dc > 0:
@@ -417,12 +501,12 @@ class Game(Observable):
 
         self.time += DISARM_TIME
         trap = self.hero.room.trap
-        check = self.hero.agility.bonus + roll()
+        check = self.hero.agility.bonus + roll(self.rng.combat)
         if check >= trap.disarm_dc:
             self.add_message("You disarm it!")
             self.hero.room.trap = None
             self.visit_room()
-            sounds.disarm.play()
+            self.effects.play_sound("disarm")
         elif check >= trap.disarm_dc // 2:
             self.visit_room(title="This seems difficult to disarm...")
         else:
@@ -507,15 +591,10 @@ class Game(Observable):
     def look(self) -> None:
         """Mark as seen rooms that are within line of sight"""
         start = self.hero.room
-        start.look()
-        for d in Direction:
-            room = start
-            while room.allows_sight and d in room.neighbors:
-                room.look()
-                room = room.neighbors[d]
-            if room.visible:
-                # We got to a room that blocks vision, but can be looked at
-                room.look()
+        level = self.current_level
+        level.focus(start)
+        for room in level.sight(start):
+            room.look()
 
     def rest(self) -> None:
         self.time += REST_TIME
@@ -0,0 +1,57 @@
+"""Drive games without the wasabi2d front-end, for batch jobs and tools.
+
+A headless loop does the work the UI does every frame: deliver pending
+observer notifications (this is how a game notices the hero has died), and
+then resolve the menus and messages the game requested:
+
+    g = headless.new_game()
+    g.move(Direction.EAST)
+    for menu in headless.settle(g):
+        headless.choose(menu, menu.entries[0].key if menu.entries else None)
+"""
+from typing import List, Optional
+
+from effects import Effects, NullEffects
+import game
+from menu import Menu
+import observer
+from world import World
+
+
+def new_game(
+    effects: Optional[Effects] = None,
+    world: Optional[World] = None,
+    seed: Optional[int] = None,
+) -> game.Game:
+    return game.Game(
+        effects=effects if effects is not None else NullEffects(),
+        world=world,
+        seed=seed,
+    )
+
+
+def settle(g: game.Game) -> List[Menu]:
+    """Dispatch pending notifications and return requested menus.
+
+    Notifications are queued per thread; this delivers the ones of every
+    game played in the current thread.
+
+    Menus are returned in the order the UI would show them to the player,
+    most recent first.
+    """
+    observer.dispatch_events()
+    events = g.pop_events()
+    events.reverse()
+    return events
+
+
+def choose(menu: Menu, key: Optional[str]) -> None:
+    """Act on a menu as if the player pressed `key`; None cancels it"""
+    if key is None:
+        menu.cancel()
+        return
+    for e in menu.entries:
+        if e.key == key:
+            e.action()
+            return
+    raise KeyError(f"No action for {key!r} in menu {menu.title!r}")
@@ -33,11 +33,14 @@ class Hero(observer.Observable):
         "agility",
         "health",
         "awareness",
+        "inventory",
     }
     OBSERVABLE_PROPERTIES = {
         "room": ("x", "y"),
         "max_hit_points": ("hit_points",),
         "damage": ("hit_points",),
+        "level": ("max_hit_points", "hit_points"),
+        "health": ("max_hit_points", "hit_points"),
     }
 
     level: int = 1
@@ -65,7 +68,7 @@ class Hero(observer.Observable):
         self.awareness = Stat()
         self.power = Stat()
 
-        self.room = world.levels[0].entrance
+        self.room = world.level(0).entrance
         self.resistances = set()
 
         self.inventory = []
@@ -123,6 +126,10 @@ class Hero(observer.Observable):
         else:
             return None
 
+    def holds(self, kind_id: str) -> bool:
+        """True if there's an item of that kind in the inventory"""
+        return any(i.kind.id == kind_id for i in self.inventory)
+
     def pick_up(self) -> None:
         """add `item` from current room to inventory. May drop another"""
         assert self.room.loot
@@ -0,0 +1,131 @@
+"""Level packs: many pre-generated floors in a single file.
+
+A pack is built offline (see build_pack.py) and opened by World, which then
+loads floors from it instead of generating them. Floor i of a pack built
+with seed S is always Level.random() from Random(f"{S}/{i}"), so a
+pack can be rebuilt exactly, and any range of it reproduced.
+
+File layout (little endian):
+
+    header   MAGIC, version (u16), floor count (u32), index offset (u64)
+    floors   zlib compressed Level.to_bytes(), one after the other
+    index    floor count + 1 offsets (u64); floor i is data[index[i]:index[i + 1]]
+"""
+import argparse
+import mmap
+import multiprocessing
+import random
+import struct
+import sys
+import time
+import zlib
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+import game  # noqa: F401  Must be imported before world (import cycle)
+import world
+
+MAGIC = b"SPCK"
+VERSION = 2
+_HEADER = struct.Struct("<4sHIQ")
+
+
+def floor_seed(seed: int, number: int) -> str:
+    return f"{seed}/{number}"
+
+
+def generate(seed: int, number: int, width: int, height: int) -> bytes:
+    """Floor `number` of the pack with the given seed, compressed"""
+    rng = random.Random(floor_seed(seed, number))
+    return zlib.compress(world.Level.random(width, height, rng).to_bytes())
+
+
+def _generate(args: Tuple[int, int, int, int]) -> bytes:
+    return generate(*args)
+
+
+def write(f: BinaryIO, floors: Iterator[bytes]) -> int:
+    """Write a pack with the given compressed floors. Returns the floor count"""
+    f.write(bytes(_HEADER.size))  # Filled in at the end
+    offsets = [_HEADER.size]
+    for data in floors:
+        f.write(data)
+        offsets.append(offsets[-1] + len(data))
+    count = len(offsets) - 1
+    f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+    f.seek(0)
+    f.write(_HEADER.pack(MAGIC, VERSION, count, offsets[-1]))
+    return count
+
+
+def build(
+    filename: str,
+    count: int,
+    seed: int = 0,
+    width: int = 24,
+    height: int = 15,
+    processes: Optional[int] = None,
+) -> None:
+    """Generate `count` floors across a process pool and write them as a pack"""
+    jobs = ((seed, i, width, height) for i in range(count))
+    with multiprocessing.Pool(processes) as pool, open(filename, "wb") as f:
+        # imap keeps the floors in order, so the pack doesn't depend on timing
+        write(f, pool.imap(_generate, jobs, chunksize=16))
+
+
+class LevelPack:
+    """Random access to the floors of a pack file.
+
+    The file is memory mapped, so a pack opened before forking can be
+    shared by worker processes.
+    """
+
+    filename: str
+    index: List[int]
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, index_offset = _HEADER.unpack_from(self._data)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a level pack")
+        if version != VERSION:
+            raise ValueError(f"{filename}: unsupported level pack version {version}")
+        self.index = list(
+            struct.unpack_from(f"<{count + 1}Q", self._data, index_offset)
+        )
+
+    def __len__(self) -> int:
+        return len(self.index) - 1
+
+    def load(self, number: int) -> "world.Level":
+        """A fresh copy of floor `number`"""
+        if not 0 <= number < len(self):
+            raise IndexError(f"Level pack has no floor {number}")
+        data = self._data[self.index[number] : self.index[number + 1]]
+        return world.Level.from_bytes(zlib.decompress(data))
+
+    def close(self) -> None:
+        self._data.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build a pack of random floors")
+    parser.add_argument("filename")
+    parser.add_argument("-n", "--floors", type=int, default=6000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=24)
+    parser.add_argument("--height", type=int, default=15)
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="default: all cores"
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    build(args.filename, args.floors, args.seed, args.width, args.height, args.jobs)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.floors} floors of {args.width}x{args.height} written to "
+        f"{args.filename} in {elapsed:.1f}s",
+        file=sys.stderr,
+    )
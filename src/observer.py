@@ -1,4 +1,7 @@
-from typing import Any, Container, Dict, Iterable, Set, Tuple
+from operator import attrgetter
+import threading
+from types import MappingProxyType
+from typing import AbstractSet, Any, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
 from typing_extensions import Protocol
 
 Message = Dict[Any, Any]
@@ -22,15 +25,25 @@ class EventList:
         evs = self.events.copy()
         self.events = {}
         for obj, msg in evs.values():
-            for target in obj.observers:
-                target.notify(obj, msg)
+            for target, fields in obj.observers.items():
+                if fields is None or not fields.isdisjoint(msg):
+                    target.notify(obj, msg)
 
 
-_events = EventList()
+class _ThreadEvents(threading.local):
+    """Events are queued per thread, so games played in different threads
+    don't get (or lose) each other's notifications"""
+
+    def __init__(self) -> None:
+        self.events = EventList()
+
+
+_local = _ThreadEvents()
 
 
 def dispatch_events() -> None:
-    _events.dispatch()
+    """Deliver the notifications queued by the current thread"""
+    _local.events.dispatch()
 
 
 class Observer(Protocol):
@@ -38,40 +51,116 @@ class Observer(Protocol):
         ...
 
 
+# Observer -> fields it's interested in, or None for all
+Subscriptions = Mapping[Observer, Optional[FrozenSet[str]]]
+
+_NO_OBSERVERS: Subscriptions = MappingProxyType({})
+
+
+class ObservableField(property):
+    """Property for a name in Observable.OBSERVABLE_FIELDS, see Observable"""
+
+
+def _plain_field(name: str, storage: str, also: Message) -> ObservableField:
+    """Field for a plain attribute, stored as `storage`"""
+
+    def set(self: "Observable", value: Any) -> None:
+        if not self.observers:
+            # Fast path: nobody is listening, so no message to build
+            object.__setattr__(self, storage, value)
+            return
+        try:
+            change = {"new": value, "old": getattr(self, storage)}
+        except AttributeError:
+            change = {"new": value}
+        object.__setattr__(self, storage, value)
+        _local.events.new_event(self, {name: change, **also})
+
+    return ObservableField(attrgetter(storage), set)
+
+
+def _property_field(name: str, prop: property, also: Message) -> ObservableField:
+    """Field wrapping an existing property"""
+    get = prop.fget
+    fset = prop.fset
+
+    def set(self: "Observable", value: Any) -> None:
+        if fset is None:
+            raise AttributeError(f"can't set attribute {name!r}")
+        if not self.observers:
+            # Fast path: nobody is listening, so no message to build
+            fset(self, value)
+            return
+        change = {"new": value, "old": get(self)}  # type: ignore
+        fset(self, value)
+        _local.events.new_event(self, {name: change, **also})
+
+    return ObservableField(get, set, None, prop.__doc__)
+
+
 class Observable:
-    observers: Set[Observer]
+    """Base for objects that notify observers when some fields change.
+
+    Each name in OBSERVABLE_FIELDS becomes a property when the subclass is
+    created. A plain attribute is stored in the instance as "_" + name
+    (a class level value becomes the default), a property keeps its getter
+    and setter. Setting the field then works as usual, and also notifies
+    the observers, if there are any; OBSERVABLE_PROPERTIES lists extra
+    names reported as "changed" when a field is set. Other attributes are
+    not affected at all.
+    """
+
+    __slots__ = ("observers",)
 
-    OBSERVABLE_FIELDS: Container[str] = ()
+    observers: Subscriptions
+
+    OBSERVABLE_FIELDS: Iterable[str] = ()
     OBSERVABLE_PROPERTIES: Dict[str, Iterable[str]] = {}
 
     def __init__(self) -> None:
-        self.observers = set()
+        # Shared until the first registration; most rooms are never observed
+        self.observers = _NO_OBSERVERS
+
+    def register(
+        self, observer: Observer, fields: Optional[AbstractSet[str]] = None
+    ) -> None:
+        """Notify `observer` of changes to this object.
 
-    def register(self, observer: Observer) -> None:
-        self.observers.add(observer)
+        With `fields`, the observer is only notified of messages that
+        mention at least one of them (a field or an observable property).
+        """
+        subscription = frozenset(fields) if fields is not None else None
+        self.observers = {**self.observers, observer: subscription}
 
     def unregister(self, observer: Observer) -> None:
-        self.observers.remove(observer)
+        if observer not in self.observers:
+            raise KeyError(observer)
+        observers = dict(self.observers)
+        del observers[observer]
+        self.observers = observers
 
     def request_notify(self, msg: Message) -> None:
         if not self.observers:
             # This check is not required, but avoids storing a message that will not be used
             return
-        _events.new_event(self, msg)
-
-    def __setattr__(self, name: str, value: Any) -> None:
-        if name not in self.OBSERVABLE_FIELDS:
-            # This attribute is not interesting, do the usual
-            super().__setattr__(name, value)
-            return
-
-        message = {name: {"new": value}}
-        if hasattr(self, name):
-            message[name]["old"] = getattr(self, name)
-        super().__setattr__(name, value)
-        self.request_notify(message)
-        for p in self.OBSERVABLE_PROPERTIES.get(name, ()):
-            self.request_notify({p: "changed"})
-
-
-__all__ = ["dispatch_events", "Observable", "Observer"]
+        _local.events.new_event(self, msg)
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        for name in cls.OBSERVABLE_FIELDS:
+            current = getattr(cls, name, None)
+            if isinstance(current, ObservableField):
+                continue  # Already set up by a base class
+            also = {p: "changed" for p in cls.OBSERVABLE_PROPERTIES.get(name, ())}
+            if isinstance(current, property):
+                field = _property_field(name, current, also)
+            else:
+                storage = "_" + name
+                if name in cls.__dict__:
+                    # Class level value, used as default
+                    setattr(cls, storage, cls.__dict__[name])
+                field = _plain_field(name, storage, also)
+            setattr(cls, name, field)
+
+
+__all__ = ["dispatch_events", "Observable", "ObservableField", "Observer"]
@@ -0,0 +1,269 @@
+"""Routes between rooms of a floor, through the rooms the player knows.
+
+Routing works on distance fields: for a target room, the turns needed to
+get there from every known room, so the way from anywhere is just going
+downhill. Fields are cached per floor (see distance_field), and kept up
+to date by Level.route_changed as the floor changes.
+"""
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import game
+import world
+
+AVOID_COST = 50  # Extra turns worth spending to go around known traps or monsters
+FIELDS_KEPT = 8  # Distance fields cached per floor
+
+Position = Tuple[int, int]
+
+
+KEY = "key_wood"  # Item that unlocks doors
+
+
+def cost(room: "world.Room", key: bool = False) -> Optional[int]:
+    """Turns needed to go through `room`. None if it's not a way to go.
+
+    With `key`, doors are unlocked instead of broken (this doesn't count
+    keys, every door on the way is priced as if there was one for it).
+    """
+    if not room.seen or not room.visible:
+        return None
+    turns = game.MOVE_TIME
+    if room.door is not None:
+        turns += game.UNLOCK_TIME if key else game.BREAK_TIME
+    trap = room.trap
+    if trap is not None and trap.hide_dc == 0:
+        turns += AVOID_COST
+    if room.monster is not None:
+        turns += AVOID_COST
+    return turns
+
+
+class DistanceField:
+    """Turns to get to a target room, from each known room.
+
+    When a room gets cheaper to go through (a door opens, a monster dies, a
+    room is seen), only the distances that improve are updated. When one
+    gets more expensive the field is built again, on the next query.
+    """
+
+    level: "world.Level"
+    target: Position
+    key: bool  # Priced with a key, see cost()
+    distances: Dict[Position, int]
+    costs: Dict[Position, Optional[int]]  # cost() of the rooms looked at
+
+    def __init__(
+        self, level: "world.Level", target: "world.Room", key: bool = False
+    ) -> None:
+        self.level = level
+        self.target = (target.x, target.y)
+        self.key = key
+        self.stale = True
+        self.distances = {}
+        self.costs = {}
+
+    def _cost(self, room: "world.Room") -> Optional[int]:
+        pos = (room.x, room.y)
+        if pos not in self.costs:
+            self.costs[pos] = cost(room, self.key)
+        return self.costs[pos]
+
+    def _build(self) -> None:
+        self.distances = {}
+        self.costs = {}
+        self.stale = False
+        if self._cost(self.level.room(*self.target)) is not None:
+            self.distances[self.target] = 0
+            self._spread([(0, self.target)])
+
+    def _spread(self, pending: List[Tuple[int, Position]]) -> None:
+        """Dijkstra's algorithm, from rooms with a known distance"""
+        level = self.level
+        distances = self.distances
+        heapq.heapify(pending)
+        while pending:
+            d, pos = heapq.heappop(pending)
+            if d > distances[pos]:
+                continue  # Already got there through a shorter way
+            room = level.room(*pos)
+            turns = self._cost(room)
+            if turns is None:
+                continue
+            d += turns
+            exits = room.exits
+            for i, bit in enumerate(world.BIT):
+                if not exits & bit:
+                    continue
+                n = room.neighbor(i)
+                npos = (n.x, n.y)
+                if d < distances.get(npos, d + 1) and self._cost(n) is not None:
+                    distances[npos] = d
+                    heapq.heappush(pending, (d, npos))
+
+    def changed(self, room: "world.Room") -> None:
+        """Update after a change in `room` that may affect routes"""
+        if self.stale:
+            return
+        pos = (room.x, room.y)
+        if pos not in self.costs:
+            return  # Never got there, so it makes no difference
+        old = self.costs.pop(pos)
+        new = self._cost(room)
+        if new == old:
+            return
+        if old is not None and (new is None or new > old):
+            self.stale = True
+            return
+        # Cheaper than before: routes through it may get shorter
+        if pos not in self.distances:
+            if pos == self.target:
+                self.distances[pos] = 0
+            else:
+                # It wasn't a way to go before; see if it's reachable now
+                ways = [
+                    self.distances[npos] + turns
+                    for _, npos, turns in self._ways_out(room)
+                    if npos in self.distances and turns is not None
+                ]
+                if not ways:
+                    return
+                self.distances[pos] = min(ways)
+        self._spread([(self.distances[pos], pos)])
+
+    def _ways_out(
+        self, room: "world.Room"
+    ) -> List[Tuple[int, Position, Optional[int]]]:
+        """Direction index, position and cost of each neighbor of `room`"""
+        result = []
+        exits = room.exits
+        for i, bit in enumerate(world.BIT):
+            if exits & bit:
+                n = room.neighbor(i)
+                result.append((i, (n.x, n.y), self._cost(n)))
+        return result
+
+    def distance(self, room: "world.Room") -> Optional[int]:
+        """Turns from `room` to the target; None if there's no known way"""
+        if self.stale:
+            self._build()
+        return self.distances.get((room.x, room.y))
+
+    def step(self, room: "world.Room") -> Optional["world.Direction"]:
+        """Direction of the first move from `room` on the way to the target"""
+        if self.stale:
+            self._build()
+        best: Optional[Tuple[int, int]] = None
+        for i, npos, turns in self._ways_out(room):
+            if npos in self.distances and turns is not None:
+                candidate = (self.distances[npos] + turns, i)
+                if best is None or candidate < best:
+                    best = candidate
+        if best is None:
+            return None
+        return world.DIRECTIONS[best[1]]
+
+    def route(self, room: "world.Room") -> List["world.Direction"]:
+        """All the moves from `room` to the target; empty if there's no way"""
+        moves = []
+        while (room.x, room.y) != self.target:
+            d = self.step(room)
+            if d is None:
+                return []
+            moves.append(d)
+            room = room.neighbor(d.index)
+        return moves
+
+
+def borders_unexplored(room: "world.Room") -> bool:
+    """True if there's an unseen room that can be seen next to `room`"""
+    frontier = room.level.frontier()
+    exits = room.exits
+    for i, bit in enumerate(world.BIT):
+        if exits & bit:
+            n = room.neighbor(i)
+            if (n.x, n.y) in frontier and n.visible:
+                return True
+    return False
+
+
+def unexplored_route(
+    level: "world.Level", start: "world.Room", key: bool = False
+) -> Optional[Tuple["world.Room", List["world.Direction"]]]:
+    """The closest known room next to unexplored ones, and the way there.
+
+    None if there's nothing left to explore. This searches from the hero on
+    each call, rather than keeping a distance field to the frontier: the
+    frontier moves with every look, and as it recedes (down a corridor, say)
+    every known distance grows, so such a field would be rebuilt over the
+    whole known floor each time. The search stops at the closest target, a
+    few dozen rooms away, and holds on to the rooms it makes meanwhile,
+    since the level keeps them only while observed.
+    """
+    frontier = level.frontier()
+    rooms: Dict[Position, "world.Room"] = {}
+
+    def room_at(pos: Position) -> "world.Room":
+        room = rooms.get(pos)
+        if room is None:
+            room = rooms[pos] = level.room(*pos)
+        return room
+
+    def neighbor(pos: Position, i: int) -> Position:
+        return pos[0] + world.DX[i], pos[1] + world.DY[i]
+
+    if not any(room_at(pos).visible for pos in frontier):
+        return None
+    origin = (start.x, start.y)
+    distances = {origin: 0}
+    came_from: Dict[Position, Tuple[Position, int]] = {}
+    pending = [(0, origin)]
+    while pending:
+        d, pos = heapq.heappop(pending)
+        if d > distances[pos]:
+            continue
+        exits = room_at(pos).exits
+        if pos != origin and any(
+            exits & bit
+            and neighbor(pos, i) in frontier
+            and room_at(neighbor(pos, i)).visible
+            for i, bit in enumerate(world.BIT)
+        ):
+            room = rooms[pos]
+            moves = []
+            while pos != origin:
+                pos, i = came_from[pos]
+                moves.append(world.DIRECTIONS[i])
+            moves.reverse()
+            return room, moves
+        for i, bit in enumerate(world.BIT):
+            if not exits & bit:
+                continue
+            npos = neighbor(pos, i)
+            turns = cost(room_at(npos), key)
+            if turns is None:
+                continue
+            if d + turns < distances.get(npos, d + turns + 1):
+                distances[npos] = d + turns
+                came_from[npos] = (pos, i)
+                heapq.heappush(pending, (d + turns, npos))
+    return None
+
+
+def distance_field(
+    level: "world.Level", target: "world.Room", key: bool = False
+) -> DistanceField:
+    """The cached distance field of `level` towards `target`, see cost()"""
+    pos = (target.x, target.y)
+    field = level.fields.pop(pos, None)
+    if field is not None and field.key != key:
+        # The hero got or used up a key; price the doors again
+        field.key = key
+        field.stale = True
+    if field is None:
+        field = DistanceField(level, target, key)
+        if len(level.fields) >= FIELDS_KEPT:
+            # Forget the least recently used
+            del level.fields[next(iter(level.fields))]
+    level.fields[pos] = field  # Most recently used last
+    return field
@@ -0,0 +1,208 @@
+"""Action logs: a game as its seeds and the player actions, to play it again.
+
+A log is a text file. The first line is a JSON header with the seed of the
+game's random numbers and what's needed to build the same World; then
+comes a line for each action:
+
+    north, south, east, west, search, rest, inventory, travel, explore
+        player actions on the map (see ACTIONS)
+    choose KEY
+        the menu on top picks the entry with that key (MenuItem.key)
+    cancel
+        the menu on top is cancelled
+    close
+        the message on top is closed
+
+and, when the game is over or quit, "end" and a hash of the final state
+(see state_hash). Replaying keeps a stack of the open menus like the UI
+does, delivering notifications after each action, like a frame would:
+
+    python run_replay.py last_game.log
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, TextIO
+
+from effects import Effects
+import game
+import headless
+from levelpack import LevelPack
+from menu import Menu
+import observer
+import savegame
+from world import Direction, World
+
+VERSION = 1
+LOG_FILE = "last_game.log"  # Where the interactive game keeps its log
+
+CHOOSE = "choose"
+CANCEL = "cancel"
+CLOSE = "close"
+END = "end"
+
+ACTIONS: Dict[str, Callable[[game.Game], None]] = {
+    "north": lambda g: g.move(Direction.NORTH),
+    "south": lambda g: g.move(Direction.SOUTH),
+    "east": lambda g: g.move(Direction.EAST),
+    "west": lambda g: g.move(Direction.WEST),
+    "search": game.Game.search,
+    "rest": game.Game.rest,
+    "inventory": game.Game.inventory,
+    "travel": game.Game.travel_to_stairs,
+    "explore": game.Game.explore,
+}
+
+
+def state_hash(g: game.Game) -> str:
+    """Digest of the state of the game, the hero and every floor kept"""
+    data = savegame.encode_state(g) + g.world.to_bytes()
+    return hashlib.sha1(data).hexdigest()
+
+
+class Recorder:
+    """Writes the log of a game while it's played, from its start.
+
+    The seed of the game's random numbers goes in the log. The log is ended
+    when the game is over, or when the program exits.
+    """
+
+    file: TextIO
+
+    def __init__(self, g: game.Game, filename: str) -> None:
+        self.game = g
+        w = g.world
+        header = {
+            "version": VERSION,
+            "seed": g.rng.seed,
+            "world_seed": w.seed,
+            "floors": w.floor_count,
+            "pack": w.pack.filename if w.pack is not None else None,
+            "first": w.first,
+        }
+        self.file = open(filename, "w")
+        self.file.write(json.dumps(header) + "\n")
+        g.register(self, fields={"win"})
+        atexit.register(self.close)
+
+    def record(self, action: str) -> None:
+        if not self.file.closed:
+            self.file.write(action + "\n")
+
+    def notify(self, obj: observer.Observable, msg: observer.Message) -> None:
+        if self.game.win is not None:
+            self.close()
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self.file.write(f"{END} {state_hash(self.game)}\n")
+        self.file.close()
+        self.game.unregister(self)
+        atexit.unregister(self.close)
+
+
+class Log(NamedTuple):
+    seed: int
+    world_seed: int
+    floors: Optional[int]  # None for an endless spire
+    pack: Optional[str]
+    first: int
+    actions: List[str]
+    end: Optional[str]  # Hash of the final state; None if the log was cut short
+
+
+def read(filename: str) -> Log:
+    with open(filename) as f:
+        header = json.loads(f.readline())
+        if header.get("version") != VERSION:
+            raise ValueError(f"{filename}: unsupported log version")
+        actions = f.read().splitlines()
+    end = None
+    if actions and actions[-1].startswith(END + " "):
+        end = actions.pop().split()[1]
+    return Log(
+        seed=header["seed"],
+        world_seed=header["world_seed"],
+        floors=header["floors"],
+        pack=header["pack"],
+        first=header["first"],
+        actions=actions,
+        end=end,
+    )
+
+
+def play(log: Log, effects: Optional[Effects] = None) -> game.Game:
+    """Play the actions of `log` again, headless. Returns the game as they leave it"""
+    pack = LevelPack(log.pack) if log.pack is not None else None
+    w = World(
+        floor_count=log.floors,
+        pack=pack,
+        first=log.first,
+        endless=log.floors is None,
+        seed=log.world_seed,
+    )
+    g = headless.new_game(effects, world=w, seed=log.seed)
+    menus: List[Menu] = []  # Open menus, the one on top last
+    for i, action in enumerate(log.actions, start=2):
+        name, _, key = action.partition(" ")
+        if name in ACTIONS:
+            if menus:
+                raise ValueError(f"Line {i}: {action!r} with a menu open")
+            ACTIONS[name](g)
+        elif name in (CHOOSE, CANCEL, CLOSE):
+            if not menus:
+                raise ValueError(f"Line {i}: {action!r} with no menu open")
+            menu = menus.pop()
+            if (name == CLOSE) != (not menu.entries):
+                raise ValueError(f"Line {i}: {action!r} on {menu.title!r}")
+            if name != CLOSE:
+                headless.choose(menu, key if name == CHOOSE else None)
+        else:
+            raise ValueError(f"Line {i}: unknown action {action!r}")
+        # settle() returns the most recent first, the UI ends up with the
+        # oldest on top
+        menus.extend(headless.settle(g))
+    return g
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Play action logs again, and check that they end the same"
+    )
+    parser.add_argument("logs", nargs="+", metavar="LOG")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=1, help="play each log this many times"
+    )
+    args = parser.parse_args(argv)
+
+    failed = False
+    for filename in args.logs:
+        log = read(filename)
+        start = time.perf_counter()
+        try:
+            for _ in range(args.repeat):
+                g = play(log)
+        except (ValueError, KeyError) as e:
+            print(f"{filename}: the game went a different way. {e}")
+            failed = True
+            continue
+        elapsed = (time.perf_counter() - start) / args.repeat
+        digest = state_hash(g)
+        if log.end is None:
+            check = "no final state to check"
+        elif digest == log.end:
+            check = "same final state"
+        else:
+            check = f"DIFFERENT final state, {digest} instead of {log.end}"
+            failed = True
+        actions = len(log.actions)
+        print(
+            f"{filename}: {actions} actions in {elapsed * 1000:.1f}ms"
+            f" ({actions / elapsed:.0f}/s), {check}"
+        )
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,498 @@
+"""Saved games: the whole state of a Game in a binary file.
+
+File layout (little endian):
+
+    header    MAGIC, version (u16), snapshot size (u32)
+    snapshot  level pack filename (u16 size + UTF-8, empty if none), world
+              size (u32) and World.to_bytes(), then entries with the state
+              of the game, the hero and the game's random streams. Floors
+              are compressed in the background, see World.serializer
+    changes   batches of entries appended by Autosave, each one its size
+              (u32) and the entries. A batch cut short (the game was killed
+              while writing it) is ignored
+
+An entry is a tag byte and a fixed layout (see the structs below), followed
+by items for inventories, and by positions or bits for seen rooms. Floors are saved as
+the world compacts them, and only restored when the game needs them, so
+loading takes little more than reading the file.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import atexit
+import math
+import os
+import struct
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, cast
+
+from effects import Effects
+import game
+import hero
+from levelpack import LevelPack
+import observer
+import treasure
+from util import GameRandom
+import world
+
+MAGIC = b"SPSV"
+VERSION = 3
+AUTOSAVE_FILE = "autosave.sav"  # Where the interactive game keeps itself saved
+# Size of the changes appended by Autosave before writing a new snapshot
+# instead, so loading never has to replay too much
+COMPACT_SIZE = 16 * 1024
+
+_HEADER = struct.Struct("<4sHI")
+_SIZE = struct.Struct("<I")
+_NAME = struct.Struct("<H")
+
+# Entry tags
+(
+    GAME,
+    HERO_ROOM,
+    HERO_VALUE,
+    HERO_STAT,
+    HERO_INVENTORY,
+    ROOM,
+    SEEN,
+    RNG,
+    SEEN_ROOMS,
+) = range(1, 10)
+_GAME = struct.Struct("<BIbI")  # tag, time, win (-1 while playing), current floor
+# tag, floor, x, y, then the same for the previous room (floor -1 if none)
+_HERO_ROOM = struct.Struct("<BIIIiII")
+_HERO_VALUE = struct.Struct("<BBi")  # tag, index in HERO_VALUES, value
+_HERO_STAT = struct.Struct("<BBii")  # tag, index in STATS, score, damage
+_HERO_INVENTORY = struct.Struct("<BH")  # tag, items; then an _ITEM for each
+_ITEM = struct.Struct("<BiB")  # treasure code, amount, 1 if worn
+_ROOM = struct.Struct("<BIIIBBBBi")  # tag, floor, x, y, LevelStore.cell_state()
+_SEEN = struct.Struct("<BIIII")  # tag, floor, region x, y, size; then the seen bits
+_SEEN_ROOMS = struct.Struct("<BII")  # tag, floor, rooms; then a _POSITION for each
+_POSITION = struct.Struct("<II")  # x, y
+# tag, game seed, index in GameRandom.STREAMS, gauss_next (NaN if None); then
+# the Mersenne Twister state
+_RNG = struct.Struct("<BIBd")
+_MT = struct.Struct("<625I")
+_MT_VERSION = 3  # Of random.Random.getstate()
+
+HERO_VALUES = ("level", "damage")
+STATS = ("strength", "agility", "health", "awareness", "power")
+HERO_FIELDS = ("room",) + HERO_VALUES + STATS + ("inventory",)
+# Room fields that the hero changes; seen rooms are saved apart, from
+# Level.newly_seen
+ROOM_FIELDS = {"door", "trap", "monster", "loot"}
+
+# Files are written here, so saving doesn't make the game wait for the disk
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="save")
+
+
+def _game_entry(g: game.Game) -> bytes:
+    win = -1 if g.win is None else int(g.win)
+    return _GAME.pack(GAME, g.time, win, g.current_level.number)
+
+
+def _hero_entries(pc: hero.Hero, fields: Iterable[str]) -> List[bytes]:
+    entries = []
+    for name in fields:
+        if name == "room":
+            prev = pc.previous_room
+            entries.append(
+                _HERO_ROOM.pack(
+                    HERO_ROOM,
+                    pc.room.level.number,
+                    pc.x,
+                    pc.y,
+                    *((prev.level.number, prev.x, prev.y) if prev else (-1, 0, 0)),
+                )
+            )
+        elif name in HERO_VALUES:
+            value = getattr(pc, name)
+            entries.append(_HERO_VALUE.pack(HERO_VALUE, HERO_VALUES.index(name), value))
+        elif name in STATS:
+            stat = getattr(pc, name)
+            entries.append(
+                _HERO_STAT.pack(HERO_STAT, STATS.index(name), stat.score, stat.damage)
+            )
+        elif name == "inventory":
+            worn = list(pc.worn.values())
+            entries.append(_HERO_INVENTORY.pack(HERO_INVENTORY, len(pc.inventory)))
+            entries.extend(
+                _ITEM.pack(treasure.encode(i.kind), i.amount, i in worn)
+                for i in pc.inventory
+            )
+    return entries
+
+
+def _room_entry(room: world.Room) -> bytes:
+    state = room.store.cell_state(room.cell)
+    return _ROOM.pack(ROOM, room.level.number, room.x, room.y, *state)
+
+
+def _seen_entry(level: world.Level, region: Tuple[int, int]) -> bytes:
+    bits = level.seen_bits(region)
+    return _SEEN.pack(SEEN, level.number, *region, len(bits)) + bits
+
+
+def _seen_rooms_entry(level: world.Level, positions: List[Tuple[int, int]]) -> bytes:
+    entry = _SEEN_ROOMS.pack(SEEN_ROOMS, level.number, len(positions))
+    return entry + b"".join(_POSITION.pack(x, y) for x, y in positions)
+
+
+def _rng_entry(rng: GameRandom, index: int) -> bytes:
+    version, mt, gauss = getattr(rng, GameRandom.STREAMS[index]).getstate()
+    assert version == _MT_VERSION
+    gauss = math.nan if gauss is None else gauss
+    return _RNG.pack(RNG, rng.seed, index, gauss) + _MT.pack(*mt)
+
+
+def encode_state(g: game.Game) -> bytes:
+    """Entries with the state of the game and the hero, floors aside"""
+    return _game_entry(g) + b"".join(_hero_entries(g.hero, HERO_FIELDS))
+
+
+def _snapshot(g: game.Game) -> Callable[[], bytes]:
+    """The contents of a saved game file for `g`, as it is now.
+
+    The game is copied here, but the floors are compressed by the function
+    returned, which is meant to be called in the background.
+    """
+    pack = g.world.pack
+    # The full path, so the game can be continued from another directory
+    name = os.path.abspath(pack.filename).encode() if pack is not None else b""
+    world_bytes = g.world.serializer()
+    state = [encode_state(g)]
+    state.extend(_rng_entry(g.rng, i) for i in range(len(GameRandom.STREAMS)))
+
+    def contents() -> bytes:
+        world_data = world_bytes()
+        parts = [_NAME.pack(len(name)), name, _SIZE.pack(len(world_data))]
+        body = b"".join(parts + [world_data] + state)
+        return _HEADER.pack(MAGIC, VERSION, len(body)) + body
+
+    return contents
+
+
+def _apply(g: game.Game, data: bytes, pos: int, end: int) -> None:
+    """Apply the entries in data[pos:end] to `g`"""
+    w = g.world
+    pc = g.hero
+    while pos < end:
+        tag = data[pos]
+        if tag == GAME:
+            _, time, win, floor = _GAME.unpack_from(data, pos)
+            pos += _GAME.size
+            g.time = time
+            g.win = None if win < 0 else bool(win)
+            g.current_level = w.level(floor)
+        elif tag == HERO_ROOM:
+            _, floor, x, y, prev_floor, prev_x, prev_y = _HERO_ROOM.unpack_from(
+                data, pos
+            )
+            pos += _HERO_ROOM.size
+            pc.room = w.level(floor).room(x, y)
+            if prev_floor < 0:
+                pc.previous_room = None
+            else:
+                pc.previous_room = w.level(prev_floor).room(prev_x, prev_y)
+        elif tag == HERO_VALUE:
+            _, index, value = _HERO_VALUE.unpack_from(data, pos)
+            pos += _HERO_VALUE.size
+            setattr(pc, HERO_VALUES[index], value)
+        elif tag == HERO_STAT:
+            _, index, score, damage = _HERO_STAT.unpack_from(data, pos)
+            pos += _HERO_STAT.size
+            stat = getattr(pc, STATS[index])
+            stat.score = score
+            stat.damage = damage
+        elif tag == HERO_INVENTORY:
+            _, count = _HERO_INVENTORY.unpack_from(data, pos)
+            pos += _HERO_INVENTORY.size
+            inventory = []
+            worn = {}
+            for _ in range(count):
+                code, amount, is_worn = _ITEM.unpack_from(data, pos)
+                pos += _ITEM.size
+                item = treasure.Item(treasure.decode(code).id)
+                item.amount = amount
+                inventory.append(item)
+                if is_worn:
+                    worn[item.kind.slot] = item
+            pc.inventory = inventory
+            pc.worn = worn
+        elif tag == ROOM:
+            _, floor, x, y, *state = _ROOM.unpack_from(data, pos)
+            pos += _ROOM.size
+            level = w.level(floor)
+            room = level.room(x, y)
+            room.store.set_cell_state(room.cell, *state)
+            level.forget_sight()
+            level.route_changed(room)
+        elif tag == SEEN:
+            _, floor, cx, cy, size = _SEEN.unpack_from(data, pos)
+            pos += _SEEN.size
+            w.level(floor).set_seen_bits((cx, cy), data[pos : pos + size])
+            pos += size
+        elif tag == SEEN_ROOMS:
+            _, floor, count = _SEEN_ROOMS.unpack_from(data, pos)
+            pos += _SEEN_ROOMS.size
+            level = w.level(floor)
+            for _ in range(count):
+                x, y = _POSITION.unpack_from(data, pos)
+                pos += _POSITION.size
+                level.room(x, y).seen = True
+        elif tag == RNG:
+            _, seed, index, gauss = _RNG.unpack_from(data, pos)
+            mt = _MT.unpack_from(data, pos + _RNG.size)
+            pos += _RNG.size + _MT.size
+            if g.rng.seed != seed:
+                g.rng = GameRandom(seed)
+            getattr(g.rng, GameRandom.STREAMS[index]).setstate(
+                (_MT_VERSION, mt, None if math.isnan(gauss) else gauss)
+            )
+        else:
+            raise ValueError(f"Unknown saved game entry {tag}")
+
+
+def save(g: game.Game, filename: str) -> "Future[None]":
+    """Save `g` to `filename`, which is written in the background"""
+    return _writer.submit(_write_snapshot, filename, _snapshot(g))
+
+
+def load(filename: str, effects: Optional[Effects] = None) -> game.Game:
+    """The game saved in `filename`, with the changes autosaved after it.
+
+    Menus that were open aren't saved; Game.visit_room() brings up the
+    ones of the room the hero is in. Raises OSError if a file can't be read
+    (the save, or its level pack) and ValueError if the save is damaged.
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    try:
+        return _load(filename, data, effects)
+    except (struct.error, zlib.error, IndexError, KeyError) as e:
+        raise ValueError(f"{filename}: damaged saved game ({e})") from e
+
+
+def _load(filename: str, data: bytes, effects: Optional[Effects]) -> game.Game:
+    magic, version, size = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{filename} is not a saved game")
+    if version != VERSION:
+        raise ValueError(f"{filename}: unsupported saved game version {version}")
+    pos = _HEADER.size
+    end = pos + size
+    if len(data) < end:
+        raise ValueError(f"{filename}: truncated saved game")
+    (name_size,) = _NAME.unpack_from(data, pos)
+    pos += _NAME.size
+    pack_name = data[pos : pos + name_size].decode()
+    pos += name_size
+    (world_size,) = _SIZE.unpack_from(data, pos)
+    pos += _SIZE.size
+    w = world.World.from_bytes(
+        data[pos : pos + world_size], LevelPack(pack_name) if pack_name else None
+    )
+    g = game.Game(effects=effects, world=w)
+    _apply(g, data, pos + world_size, end)
+    pos = end
+    while pos + _SIZE.size <= len(data):
+        (size,) = _SIZE.unpack_from(data, pos)
+        pos += _SIZE.size
+        if pos + size > len(data):
+            break  # Cut short
+        _apply(g, data, pos, pos + size)
+        pos += size
+    # Replaying may have compacted the floors the hero was taken to; make
+    # sure the game goes on in the live ones
+    pc = g.hero
+    prev = pc.previous_room
+    if prev is not None:
+        pc.previous_room = w.level(prev.level.number).room(prev.x, prev.y)
+    g.current_level = w.level(g.current_level.number)
+    pc.room = g.current_level.room(pc.x, pc.y)
+    g.look()
+    return g
+
+
+def _replace(filename: str, data: bytes) -> None:
+    # Written aside first, so the old file stays if the new one can't be
+    temp = filename + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(data)
+    os.replace(temp, filename)
+
+
+def _write_snapshot(filename: str, contents: Callable[[], bytes]) -> None:
+    _replace(filename, contents())
+
+
+def _append(filename: str, data: bytes) -> None:
+    with open(filename, "ab") as f:
+        f.write(data)
+
+
+def _remove(filename: str) -> None:
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def _submit(fn: Callable[..., None], *args: Any) -> None:
+    """Run fn(*args) in the background, in order with the other writes"""
+    try:
+        _writer.submit(fn, *args)
+    except RuntimeError:
+        # The program is exiting, and the writer is already done with the
+        # rest; write it here
+        fn(*args)
+
+
+class Autosave:
+    """Keeps a game saved in a file while it's played.
+
+    It starts with a snapshot of the whole game, and then each flush()
+    appends what changed since the previous one, as reported by the
+    notifications of the game, the hero and the rooms around the hero (the
+    only ones the hero can change). Rooms seen are taken from the
+    Level.newly_seen of the live floors; a floor that got live without
+    keeping it has its regions with new rooms saved whole once. Random
+    streams are saved when they were drawn from. Once the changes add up
+    to COMPACT_SIZE, a new snapshot replaces them. The file goes away when
+    the game is over, and gets a last flush when the program exits.
+
+    Only the changes are encoded when flushing; snapshots are compressed and
+    the file is written in the background.
+    """
+
+    filename: str
+    game_changed: bool
+    hero_fields: Set[str]  # Changed since the last flush
+    rooms: Set[world.Room]  # Changed since the last flush
+    explored: Dict[int, Dict[Tuple[int, int], int]]  # Level.seen_regions() as saved
+    rng_states: List[object]  # getstate() of each random stream, as saved
+    watched: Set[world.Room]
+    size: int  # Bytes appended since the snapshot
+    stopped: bool
+
+    def __init__(self, g: game.Game, filename: str) -> None:
+        self.game = g
+        self.filename = filename
+        self.watched = set()
+        self.stopped = False
+        g.register(self, fields={"time", "win", "current_level"})
+        g.hero.register(self, fields=set(HERO_FIELDS))
+        self.save()
+        self.watch()
+        atexit.register(self.close)
+
+    def notify(self, obj: observer.Observable, msg: observer.Message) -> None:
+        g = self.game
+        if obj is g:
+            self.game_changed = True
+            if g.win is not None:
+                self.stop(delete=True)
+            elif "current_level" in msg:
+                # Before the floors left behind are compacted, with the rooms
+                # seen there
+                self.flush()
+        elif obj is g.hero:
+            self.hero_fields.update(f for f in msg if f in HERO_FIELDS)
+            if "room" in msg:
+                # A trap may have gone off on the way in, before watching it
+                self.rooms.add(g.hero.room)
+                self.watch()
+        else:
+            self.rooms.add(cast(world.Room, obj))
+
+    def watch(self) -> None:
+        """Watch the room of the hero and the ones next to it"""
+        room = self.game.hero.room
+        rooms = {room, *room.neighbors.values()}
+        for r in self.watched - rooms:
+            r.unregister(self)
+        for r in rooms - self.watched:
+            r.register(self, fields=ROOM_FIELDS)
+        self.watched = rooms
+
+    def save(self) -> None:
+        """Write a snapshot of the whole game, replacing the file"""
+        self.game_changed = False
+        self.hero_fields = set()
+        self.rooms = set()
+        self.explored = {}
+        for level in self.game.world.live_levels():
+            level.newly_seen = []
+            self.explored[level.number] = level.seen_regions()
+        self.rng_states = self._rng_states()
+        self.size = 0
+        _submit(_write_snapshot, self.filename, _snapshot(self.game))
+
+    def flush(self) -> None:
+        """Append the changes since the last flush to the file"""
+        if self.stopped:
+            return
+        g = self.game
+        entries = [_game_entry(g)] if self.game_changed else []
+        entries.extend(_hero_entries(g.hero, self.hero_fields))
+        entries.extend(_room_entry(r) for r in self.rooms)
+        for level in g.world.live_levels():
+            entries.extend(self._seen_entries(level))
+        states = self._rng_states()
+        entries.extend(
+            _rng_entry(g.rng, i)
+            for i, state in enumerate(states)
+            if state != self.rng_states[i]
+        )
+        self.rng_states = states
+        self.game_changed = False
+        self.hero_fields = set()
+        self.rooms = set()
+        if not entries:
+            return
+        batch = b"".join(entries)
+        self.size += _SIZE.size + len(batch)
+        if self.size > COMPACT_SIZE:
+            self.save()
+        else:
+            _submit(_append, self.filename, _SIZE.pack(len(batch)) + batch)
+
+    def _rng_states(self) -> List[object]:
+        rng = self.game.rng
+        return [getattr(rng, name).getstate() for name in GameRandom.STREAMS]
+
+    def _seen_entries(self, level: world.Level) -> List[bytes]:
+        """Entries for the rooms of `level` seen since saved"""
+        positions = level.newly_seen
+        level.newly_seen = []
+        if positions is not None:
+            if not positions:
+                return []
+            self.explored[level.number] = level.seen_regions()
+            return [_seen_rooms_entry(level, positions)]
+        # Not kept since the floor got live (generated, or restored after
+        # being compacted); save the regions that changed whole
+        saved = self.explored.get(level.number, {})
+        regions = self.explored[level.number] = level.seen_regions()
+        return [
+            _seen_entry(level, region)
+            for region, explored in regions.items()
+            if saved.get(region) != explored
+        ]
+
+    def close(self) -> None:
+        """Save the last changes and stop saving"""
+        self.flush()
+        self.stop()
+
+    def stop(self, delete: bool = False) -> None:
+        """Stop saving, and remove the file if `delete`"""
+        if self.stopped:
+            return
+        self.stopped = True
+        atexit.unregister(self.close)
+        self.game.unregister(self)
+        self.game.hero.unregister(self)
+        for r in self.watched:
+            r.unregister(self)
+        self.watched = set()
+        if delete:
+            _submit(_remove, self.filename)
@@ -0,0 +1,271 @@
+"""Monte Carlo runner: play many complete headless games in parallel.
+
+Each game is driven by a scripted policy, and summarised in a compact
+`Result` record. This is what we use for balance and regression sweeps;
+tunables like world.DOOR_TRAP_PROBABILITY or game.MOVE_TIME can be
+overridden for a whole run with --set.
+"""
+import argparse
+import ast
+import importlib
+import multiprocessing
+import random
+import sys
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+from typing_extensions import Protocol
+
+import game
+import headless
+from levelpack import LevelPack
+from menu import Menu
+import world
+from world import Direction, Room, World
+
+MAX_ACTIONS = 20000  # Safety net, games normally end by running out of time
+
+
+class Policy(Protocol):
+    def act(self, g: game.Game) -> None:
+        """Take a map action (move, rest, search...) when there's no menu"""
+        ...
+
+    def choose(self, g: game.Game, menu: Menu) -> Optional[str]:
+        """Key of the menu entry to pick. None cancels the menu"""
+        ...
+
+
+def find_key(menu: Menu, action: Callable[[], None]) -> Optional[str]:
+    """Key of the entry in `menu` running `action`, if any"""
+    for e in menu.entries:
+        if e.action == action:
+            return e.key
+    return None
+
+
+class RandomPolicy:
+    """Random walk, picking random menu entries"""
+
+    def __init__(self, seed: int) -> None:
+        self.random = random.Random(seed)
+
+    def act(self, g: game.Game) -> None:
+        g.move(self.random.choice(list(Direction)))
+
+    def choose(self, g: game.Game, menu: Menu) -> Optional[str]:
+        if not menu.entries:
+            return None
+        return self.random.choice(menu.entries).key
+
+
+class ExplorerPolicy:
+    """Depth first exploration, preferring rooms closer to the exit.
+
+    Fights every monster, breaks every door, disarms known traps, picks up
+    all loot and climbs up whenever it finds stairs. Rests when badly hurt.
+    """
+
+    REST_RATIO = 0.3  # Rest when hit points drop below this ratio
+
+    came_from: Dict[Room, Room]
+    visited: Set[Room]
+
+    def __init__(self, seed: int) -> None:
+        self.random = random.Random(seed)
+        self.came_from = {}
+        self.visited = set()
+
+    def act(self, g: game.Game) -> None:
+        pc = g.hero
+        if pc.hit_points < pc.max_hit_points * self.REST_RATIO:
+            g.rest()
+            return
+        room = pc.room
+        if room not in self.visited:
+            self.visited.add(room)
+            if pc.previous_room is not None and pc.previous_room.level is room.level:
+                self.came_from[room] = pc.previous_room
+        exit = room.level.exit
+        candidates: List[Tuple[int, Direction]] = [
+            (abs(exit.x - n.x) + abs(exit.y - n.y), d)
+            for d, n in room.neighbors.items()
+            if n.visible and n not in self.visited
+        ]
+        if candidates:
+            g.move(min(candidates, key=lambda c: c[0])[1])
+        elif room in self.came_from:
+            back = self.came_from[room]
+            for d, n in room.neighbors.items():
+                if n is back:
+                    g.move(d)
+                    return
+        else:
+            g.move(self.random.choice(list(room.neighbors)))
+
+    def choose(self, g: game.Game, menu: Menu) -> Optional[str]:
+        if not menu.entries:
+            return None
+        room = g.hero.room
+        for action in (g.fight, g.disarm_trap, g.break_door, g.hero.pick_up):
+            key = find_key(menu, action)
+            if key is not None:
+                return key
+        if room.is_entrance():
+            return "K_2"  # Never go down
+        return menu.entries[0].key  # Go up, increase strength
+
+
+POLICIES: Dict[str, Callable[[int], Policy]] = {
+    "random": RandomPolicy,
+    "explorer": ExplorerPolicy,
+}
+
+
+class Result(NamedTuple):
+    seed: int
+    win: bool
+    time: int  # Turns used (out of Game.MAX_TIME)
+    hit_points: int
+    floor: int  # Highest floor reached, starting at 1
+    actions: int
+
+
+def play(seed: int, policy_name: str, pack: Optional[LevelPack] = None) -> Result:
+    """Play a full game with the given seed.
+
+    With a level pack, the floors are taken from it, in consecutive blocks
+    for consecutive seeds.
+    """
+    policy = POLICIES[policy_name](seed)
+    tower = None
+    if pack is not None:
+        floors = world.FLOORS
+        tower = World(pack=pack, first=seed % (len(pack) // floors) * floors)
+    g = headless.new_game(world=tower, seed=seed)
+    floor = actions = 0
+    while g.win is None and actions < MAX_ACTIONS:
+        menus = headless.settle(g)
+        if menus:
+            for m in menus:
+                headless.choose(m, policy.choose(g, m))
+        else:
+            policy.act(g)
+        actions += 1
+        floor = max(floor, g.world.level_number(g.current_level) + 1)
+    return Result(
+        seed=seed,
+        win=bool(g.win),
+        time=g.time,
+        hit_points=g.hero.hit_points,
+        floor=floor,
+        actions=actions,
+    )
+
+
+def apply_overrides(overrides: Dict[str, Any]) -> None:
+    """Set tunables given as {"module.NAME": value} or {"module.Class.NAME": value}"""
+    for path, value in overrides.items():
+        module_name, *attrs = path.split(".")
+        obj = importlib.import_module(module_name)
+        for a in attrs[:-1]:
+            obj = getattr(obj, a)
+        if not hasattr(obj, attrs[-1]):
+            raise AttributeError(f"Unknown tunable {path!r}")
+        setattr(obj, attrs[-1], value)
+
+
+_worker_policy = ""
+_worker_pack: Optional[LevelPack] = None
+
+
+def _setup_worker(
+    policy_name: str, overrides: Dict[str, Any], pack_name: Optional[str]
+) -> None:
+    global _worker_policy, _worker_pack
+    _worker_policy = policy_name
+    apply_overrides(overrides)
+    if pack_name is not None:
+        _worker_pack = LevelPack(pack_name)
+
+
+def _play_in_worker(seed: int) -> Result:
+    return play(seed, _worker_policy, _worker_pack)
+
+
+def run(
+    seeds: Iterator[int],
+    policy_name: str = "explorer",
+    overrides: Optional[Dict[str, Any]] = None,
+    processes: Optional[int] = None,
+    pack_name: Optional[str] = None,
+) -> Iterator[Result]:
+    """Play one game per seed across a process pool, yielding results as they finish"""
+    with multiprocessing.Pool(
+        processes,
+        initializer=_setup_worker,
+        initargs=(policy_name, overrides or {}, pack_name),
+    ) as pool:
+        yield from pool.imap_unordered(_play_in_worker, seeds, chunksize=16)
+
+
+def parse_override(text: str) -> Tuple[str, Any]:
+    name, _, value = text.partition("=")
+    if not value:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    return name.strip(), ast.literal_eval(value.strip())
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Play many headless games")
+    parser.add_argument("-n", "--games", type=int, default=1000)
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="default: all cores"
+    )
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="explorer")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument(
+        "--set",
+        type=parse_override,
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="override a tunable, e.g. world.DOOR_TRAP_PROBABILITY=0.3",
+    )
+    parser.add_argument("--records", action="store_true", help="print every game")
+    parser.add_argument(
+        "--pack", metavar="FILE", help="take floors from a level pack (build_pack.py)"
+    )
+    args = parser.parse_args(argv)
+
+    overrides = dict(args.set)
+    apply_overrides(overrides)  # Fail early on typos, and keep MAX_TIME in sync
+    if args.pack:
+        pack = LevelPack(args.pack)  # Fail early on bad packs too
+        if len(pack) < world.FLOORS:
+            parser.error(f"{args.pack} has less than {world.FLOORS} floors")
+        pack.close()
+    seeds = iter(range(args.seed, args.seed + args.games))
+    results = []
+    if args.records:
+        print(",".join(Result._fields))
+    for r in run(seeds, args.policy, overrides, args.jobs, args.pack):
+        results.append(r)
+        if args.records:
+            print(",".join(str(int(v)) for v in r))
+
+    if not results:
+        return
+    n = len(results)
+    wins = [r for r in results if r.win]
+    deaths = [r for r in results if not r.win and r.hit_points == 0]
+    print(f"games:      {n}", file=sys.stderr)
+    print(f"win rate:   {len(wins) / n:.1%}", file=sys.stderr)
+    print(f"deaths:     {len(deaths) / n:.1%}", file=sys.stderr)
+    print(
+        f"turns used: {sum(r.time for r in results) / n:.0f} of {game.Game.MAX_TIME}"
+        " (average)",
+        file=sys.stderr,
+    )
+    print(
+        f"floor:      {sum(r.floor for r in results) / n:.2f} (average)",
+        file=sys.stderr,
+    )
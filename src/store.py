@@ -0,0 +1,134 @@
+"""Compact array storage for the contents of a floor.
+
+A floor keeps one byte per cell in each of a few flat grids, instead of a
+Python object per room. world.Room and friends are thin views on top of
+this; the encoding of each grid is described below.
+"""
+import struct
+from typing import Dict, Tuple
+
+# Terrain codes
+FLOOR = 0
+DOOR = 1
+SECRET_DOOR = 2
+
+# Trap codes are 0 for no trap, otherwise 1 + index of the kind in
+# trap.KINDS, with this flag added while the trap is still hidden
+TRAP_HIDDEN = 0x80
+
+# Serialized layout: header, the grids in GRIDS order, the seen grid packed
+# in bits (see seen_bits), then the loot amounts
+_HEADER = struct.Struct("<IIi")  # width, height, len(loot_amounts)
+_AMOUNT = struct.Struct("<Ii")  # cell, amount
+GRIDS = ("exits", "terrain", "traps", "monsters", "loot")
+
+# bytes.translate tables between the seen grid and a string of binary digits
+_TO_DIGITS = bytes.maketrans(b"\0\1", b"01")
+_FROM_DIGITS = bytes.maketrans(b"01", b"\0\1")
+
+
+class LevelStore:
+    """Per-cell grids for a width × height floor.
+
+    Cells are numbered row by row, cell = y * width + x.
+    """
+
+    width: int
+    height: int
+
+    exits: bytearray  # Bit mask of open walls; bits defined by world.Direction
+    terrain: bytearray  # Terrain codes above
+    traps: bytearray  # Trap codes above
+    monsters: bytearray  # 1 if there is a monster in the cell
+    loot: bytearray  # 0 for no loot, otherwise 1 + index in treasure.KINDS
+    loot_amounts: Dict[int, int]  # cell -> amount, for loot stacks with amount != 1
+    seen: bytearray  # 1 if the player has seen the cell
+    explored: int  # Number of seen cells
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        size = width * height
+        self.exits = bytearray(size)
+        self.terrain = bytearray(size)
+        self.traps = bytearray(size)
+        self.monsters = bytearray(size)
+        self.loot = bytearray(size)
+        self.loot_amounts = {}
+        self.seen = bytearray(size)
+        self.explored = 0
+
+    def __len__(self) -> int:
+        return self.width * self.height
+
+    def cell(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+    def cell_state(self, cell: int) -> Tuple[int, int, int, int, int]:
+        """Terrain, trap, monster and loot codes of a cell, and the loot amount"""
+        return (
+            self.terrain[cell],
+            self.traps[cell],
+            self.monsters[cell],
+            self.loot[cell],
+            self.loot_amounts.get(cell, 1),
+        )
+
+    def set_cell_state(
+        self, cell: int, terrain: int, trap: int, monster: int, loot: int, amount: int
+    ) -> None:
+        """Inverse of cell_state"""
+        self.terrain[cell] = terrain
+        self.traps[cell] = trap
+        self.monsters[cell] = monster
+        self.loot[cell] = loot
+        self.loot_amounts.pop(cell, None)
+        if loot and amount != 1:
+            self.loot_amounts[cell] = amount
+
+    def seen_bits(self) -> bytes:
+        """The seen grid with a bit per cell, cell i in bit i % 8 of byte i // 8"""
+        size = len(self)
+        if not size:
+            return b""
+        bits = int(bytes(self.seen).translate(_TO_DIGITS)[::-1], 2)
+        return bits.to_bytes((size + 7) // 8, "little")
+
+    def set_seen_bits(self, data: bytes) -> None:
+        """Inverse of seen_bits"""
+        size = len(self)
+        bits = int.from_bytes(data, "little")
+        if bits >> size:
+            raise ValueError("Seen bits out of the level")
+        if size:
+            digits = format(bits, f"0{size}b")[::-1]
+            self.seen[:] = digits.encode().translate(_FROM_DIGITS)
+        self.explored = self.seen.count(1)
+
+    def to_bytes(self) -> bytes:
+        parts = [_HEADER.pack(self.width, self.height, len(self.loot_amounts))]
+        parts.extend(getattr(self, g) for g in GRIDS)
+        parts.append(self.seen_bits())
+        parts.extend(_AMOUNT.pack(c, a) for c, a in self.loot_amounts.items())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, offset: int = 0) -> "LevelStore":
+        """Inverse of to_bytes, reading from data[offset:]"""
+        width, height, amounts = _HEADER.unpack_from(data, offset)
+        self = cls(width, height)
+        size = width * height
+        pos = offset + _HEADER.size
+        seen_size = (size + 7) // 8
+        if len(data) < pos + size * len(GRIDS) + seen_size + amounts * _AMOUNT.size:
+            raise ValueError("Truncated level data")
+        for g in GRIDS:
+            getattr(self, g)[:] = data[pos : pos + size]
+            pos += size
+        self.set_seen_bits(data[pos : pos + seen_size])
+        pos += seen_size
+        for _ in range(amounts):
+            cell, amount = _AMOUNT.unpack_from(data, pos)
+            self.loot_amounts[cell] = amount
+            pos += _AMOUNT.size
+        return self
@@ -1,8 +1,13 @@
+from bisect import bisect
 from enum import Enum
+from itertools import accumulate
 import random
+from typing import Callable, List
 
 import game
+import store
 import treasure
+import world
 
 
 class TrapKind(Enum):
@@ -25,18 +30,61 @@ NAMES = {
 
 FREQUENCIES = {TrapKind.SPIKED_PIT: 2, TrapKind.ROCK: 2}
 
+KINDS = list(TrapKind)
+
+HIDE_DC = 12  # Difficulty of finding a hidden trap
+
+
+def random_kind(rng: random.Random) -> TrapKind:
+    return random_kinds(1, rng)[0]
+
+
+def random_kinds(count: int, rng: random.Random) -> List[TrapKind]:
+    """Pick many trap kinds at once (faster than calling random_kind repeatedly)"""
+    weights = [FREQUENCIES.get(k, 1) for k in KINDS]
+    return rng.choices(KINDS, weights, k=count)
+
+
+def kind_picker(rng: random.Random) -> Callable[[], TrapKind]:
+    """A faster random_kind, for picking many kinds one at a time.
+
+    It picks the same kinds as random_kind would, but the frequencies are
+    only looked up once, when creating the picker.
+    """
+    cum_weights = list(accumulate(FREQUENCIES.get(k, 1) for k in KINDS))
+    total = float(cum_weights[-1])
+    hi = len(KINDS) - 1
+    rand = rng.random
+    return lambda: KINDS[bisect(cum_weights, rand() * total, 0, hi)]
+
+
+def encode(kind: TrapKind, hidden: bool = True) -> int:
+    """Code for storing a trap in a level store"""
+    return (1 + KINDS.index(kind)) | (store.TRAP_HIDDEN if hidden else 0)
+
 
 class Trap:
-    hide_dc: int = 12  # Difficulty of finding if hidden. 0 if found or not hidden
+    """The trap in a room. Its state lives in the level store"""
+
     disarm_dc: int = 15
 
-    kind: TrapKind
+    room: "world.Room"
 
-    def __init__(self) -> None:
-        selection = []
-        for k in TrapKind:
-            selection += [k] * FREQUENCIES.get(k, 1)
-        self.kind = random.choice(selection)
+    def __init__(self, room: "world.Room") -> None:
+        self.room = room
+
+    @property
+    def code(self) -> int:
+        return self.room.store.traps[self.room.cell]
+
+    @property
+    def kind(self) -> TrapKind:
+        return KINDS[(self.code & ~store.TRAP_HIDDEN) - 1]
+
+    @property
+    def hide_dc(self) -> int:
+        """Difficulty of finding if hidden. 0 if found or not hidden"""
+        return HIDE_DC if self.code & store.TRAP_HIDDEN else 0
 
     def trigger(self, g: "game.Game") -> None:
         g.hero.take_damage(DAMAGE.get(self.kind, 0), game.DamageType.PHYSICAL)
@@ -69,4 +117,6 @@ class Trap:
         return NAMES[self.kind]
 
     def reveal(self) -> None:
-        self.hide_dc = 0
+        self.room.store.traps[self.room.cell] &= ~store.TRAP_HIDDEN
+        self.room.level.route_changed(self.room)
+        self.room.request_notify({"trap": "changed"})
@@ -60,13 +60,28 @@ KINDS = [
 ]
 
 KINDS_BY_ID = {k.id: k for k in KINDS}
+CODES_BY_ID = {k.id: 1 + i for i, k in enumerate(KINDS)}
 
 
-def random_kind() -> ItemKind:
+def encode(kind: ItemKind) -> int:
+    """Code for storing an item kind in a level store"""
+    return CODES_BY_ID[kind.id]
+
+
+def decode(code: int) -> ItemKind:
+    return KINDS[code - 1]
+
+
+def random_kind(rng: random.Random) -> ItemKind:
+    return kind_picker(rng)()
+
+
+def kind_picker(rng: random.Random) -> Callable[[], ItemKind]:
+    """A faster random_kind, for picking many kinds one at a time"""
     weighted_list: List[ItemKind] = []
     for k in KINDS:
         weighted_list += [k] * k.frequency
-    return random.choice(weighted_list)
+    return lambda: rng.choice(weighted_list)
 
 
 class Item:
@@ -77,9 +92,9 @@ class Item:
         self.kind = KINDS_BY_ID[kind_id]
 
     @classmethod
-    def random(cls) -> "Item":
+    def random(cls, rng: random.Random) -> "Item":
         self: Item = object.__new__(cls)
-        self.kind = random_kind()
+        self.kind = random_kind(rng)
         return self
 
 
@@ -1,5 +1,27 @@
 import random
+from typing import Optional
 
 
-def roll() -> int:
-    return random.randint(1, 20)
+class GameRandom:
+    """The random numbers of a game, as separate named streams.
+
+    Each stream is seeded from the game seed and its name, so drawing more
+    from one (an extra fight, say) doesn't change what the others give.
+    """
+
+    STREAMS = ("generation", "combat", "loot")
+
+    seed: int
+    generation: random.Random  # Building the world
+    combat: random.Random  # Checks of the hero: fights, escapes, traps, searches
+    loot: random.Random  # Drops and what they are
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.generation = random.Random(f"{self.seed}/generation")
+        self.combat = random.Random(f"{self.seed}/combat")
+        self.loot = random.Random(f"{self.seed}/loot")
+
+
+def roll(rng: random.Random) -> int:
+    return rng.randint(1, 20)
@@ -0,0 +1,90 @@
+"""The floor of the rooms on screen, drawn as a single shape.
+
+wasabi2d has no public API for a shape with per-vertex colors, so FloorMesh
+extends its Polygon and uses internals of wasabi2d 1.2.0 (the version in
+the README; check these when upgrading):
+
+ - Layer.objects and Layer._fill_vao(), to put the shape in a layer
+ - Polygon.orig_verts, the vertices, changed in place
+ - Polygon._fill_indices(), _migrate_fill() and _set_dirty(), to build the
+   triangles and upload the changes
+ - Polygon._update() and lst.vertbuf["in_color"], to write the colors
+"""
+from typing import Any
+
+import numpy as np
+from wasabi2d.color import convert_color
+from wasabi2d.layers import Layer
+from wasabi2d.primitives.polygons import Polygon
+
+from views.dimensions import ROOM_SPACING, ROOM_SIZE, DOORWAY_SIZE
+
+# Parts of a room slot
+FLOOR = 0
+EAST_DOORWAY = 1
+SOUTH_DOORWAY = 2
+
+# Corners of a quad, in the order used by wasabi2d.primitives.polygons.Rect
+_CORNERS = np.array([(-0.5, -0.5), (-0.5, 0.5), (0.5, 0.5), (0.5, -0.5)], "f4")
+# Center offset and size of each part, in rooms and pixels
+_PARTS = [
+    ((0, 0), (ROOM_SIZE, ROOM_SIZE)),
+    ((0.5, 0), (ROOM_SPACING - ROOM_SIZE, DOORWAY_SIZE)),
+    ((0, 0.5), (DOORWAY_SIZE, ROOM_SPACING - ROOM_SIZE)),
+]
+_QUAD = np.array([0, 1, 2, 0, 2, 3], "i4")  # Two triangles
+
+
+class FloorMesh(Polygon):  # type: ignore
+    """Floors and doorways of a columns × rows window of rooms.
+
+    Every room in the window has a slot of three quads (floor, east and
+    south doorways). Slots are picked by position modulo the window size,
+    so rooms scrolling in take the slots of the ones scrolling out, and
+    the mesh never grows. Colors are per vertex and changed in place; all
+    of it goes in the layer's shape buffer, drawn in a single call.
+    """
+
+    def __init__(self, layer: Layer, columns: int, rows: int) -> None:
+        self.columns = columns
+        self.rows = rows
+        self.slots = columns * rows
+        super().__init__(
+            layer, np.zeros((self.slots * len(_PARTS) * 4, 2), "f4"), color=(0, 0, 0, 0)
+        )
+        self.colors = np.zeros((len(self.orig_verts), 4), "f4")
+        layer.objects.add(self)
+        self._migrate_fill(layer._fill_vao())
+
+    def _fill_indices(self) -> Any:
+        quads = self.slots * len(_PARTS)
+        return (_QUAD + 4 * np.arange(quads, dtype="i4")[:, None]).reshape(-1)
+
+    def _update(self) -> None:
+        super()._update()
+        self.lst.vertbuf["in_color"] = self.colors
+
+    def _vertices(self, x: int, y: int) -> slice:
+        slot = (y % self.rows) * self.columns + x % self.columns
+        size = len(_PARTS) * 4
+        return slice(slot * size, (slot + 1) * size)
+
+    def place(self, x: int, y: int) -> None:
+        """Give the slot of its position to room x, y. Its parts start hidden"""
+        verts = self.orig_verts[self._vertices(x, y)].reshape(len(_PARTS), 4, 3)
+        for quad, ((dx, dy), size) in zip(verts, _PARTS):
+            quad[:, :2] = _CORNERS * size + (
+                (x + dx) * ROOM_SPACING,
+                (y + dy) * ROOM_SPACING,
+            )
+        self.colors[self._vertices(x, y)] = 0
+        self._set_dirty()
+
+    def set_color(self, x: int, y: int, part: int, color: Any) -> None:
+        start = self._vertices(x, y).start + 4 * part
+        self.colors[start : start + 4] = convert_color(color)
+        self._set_dirty()
+
+    def hide(self, x: int, y: int) -> None:
+        self.colors[self._vertices(x, y)] = 0
+        self._set_dirty()
@@ -4,6 +4,7 @@ import game
 from hudscene import HUDScene
 import observer
 from views.dimensions import SCREEN_HEIGHT
+from views.widgets import Label
 
 MINUTES_PER_TURN = 5
 
@@ -21,14 +22,22 @@ class GameInfoView:
     def __init__(self, scene: HUDScene, game: game.Game) -> None:
         self.scene = scene
         scene.hudlayers[0].add_sprite("sidebar", pos=(100, 350))
-        self.time_label = scene.hudlayers[1].add_label(
-            "<Time>", pos=(30, SCREEN_HEIGHT - 50)
+        self.time_label = Label(
+            scene.hudlayers[1], self.format, pos=(30, SCREEN_HEIGHT - 50)
         )
-        game.register(self)
+        self.nlevels = game.world.floor_count
+        self.level = 0
+        game.register(self, fields={"time", "current_level"})
         self.notify(game, {})
 
+    def format(self, level: int, time: int, explored: int) -> str:
+        nlevels = self.nlevels
+        floor = f"Floor {level}" if nlevels is None else f"Floor {level}/{nlevels}"
+        return f"{floor} ({explored}% explored)\n{convert_time(time)}"
+
     def notify(self, obj: observer.Observable, message: observer.Message) -> None:
         g = cast(game.Game, obj)
-        level = g.world.level_number(g.hero.room.level) + 1
-        nlevels = len(g.world.levels)
-        self.time_label.text = f"Floor {level}/{nlevels}\n{convert_time(g.time)}"
+        if not message or "current_level" in message:
+            self.level = g.world.level_number(g.current_level) + 1
+        explored = int(100 * g.current_level.explored)
+        self.time_label.show(self.level, g.time, explored)
@@ -0,0 +1,51 @@
+from typing import Dict, Optional, Tuple
+
+from wasabi2d.layers import Layer
+
+from views.floor import FloorMesh
+from views.room import RoomView
+import world
+
+
+class LevelView:
+    """Room views of the shown part of a floor, on a layer of its own.
+
+    Hiding the layer keeps everything in place, so a floor that was left
+    can be shown again without rebuilding it. The same view can be reused
+    later for another floor.
+    """
+
+    level: Optional[world.Level]
+
+    def __init__(self, layer: Layer, columns: int, rows: int) -> None:
+        self.layer = layer
+        self.mesh = FloorMesh(layer, columns, rows)
+        self.level = None
+        # Views of the rooms in the window, by position
+        self.rooms: Dict[Tuple[int, int], RoomView] = {}
+
+    @property
+    def visible(self) -> bool:
+        return bool(self.layer.visible)
+
+    @visible.setter
+    def visible(self, value: bool) -> None:
+        self.layer.visible = value
+
+    def show(self, columns: range, rows: range) -> None:
+        """Drop the views that went out of the window, and add the ones coming in"""
+        assert self.level is not None
+        for x, y in list(self.rooms):
+            if x not in columns or y not in rows:
+                self.rooms.pop((x, y)).delete()
+        for y in rows:
+            for x in columns:
+                if (x, y) not in self.rooms:
+                    self.rooms[x, y] = RoomView(self.level.room(x, y), self.mesh)
+
+    def clear(self) -> None:
+        """Delete all the room views, to show another level"""
+        for rv in self.rooms.values():
+            rv.delete()
+        self.rooms = {}
+        self.level = None
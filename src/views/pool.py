@@ -0,0 +1,51 @@
+"""Reusable sprites, for views that come and go as the camera moves."""
+from collections import defaultdict
+from typing import DefaultDict, List, Tuple
+from weakref import WeakKeyDictionary
+
+from wasabi2d.layers import Layer
+from wasabi2d.sprites import Sprite
+
+HIDDEN = (1, 1, 1, 0)
+
+
+class SpritePool:
+    """Hidden sprites of a layer, by image, waiting to be shown again.
+
+    Sprites are taken with acquire() while they are needed and given back
+    with release(), instead of being created and deleted each time.
+    """
+
+    free: DefaultDict[str, List[Sprite]]
+
+    _pools: "WeakKeyDictionary[Layer, SpritePool]" = WeakKeyDictionary()
+
+    def __init__(self, layer: Layer) -> None:
+        self.layer = layer
+        self.free = defaultdict(list)
+
+    @classmethod
+    def of(cls, layer: Layer) -> "SpritePool":
+        """The pool of `layer`, shared by all its views"""
+        pool = cls._pools.get(layer)
+        if pool is None:
+            pool = cls._pools[layer] = cls(layer)
+        return pool
+
+    def acquire(
+        self, image: str, pos: Tuple[float, float], scale: float, angle: float = 0
+    ) -> Sprite:
+        free = self.free[image]
+        if free:
+            sprite = free.pop()
+            sprite.pos = pos
+            sprite.angle = angle
+            sprite.color = (1, 1, 1, 1)
+        else:
+            sprite = self.layer.add_sprite(image, pos=pos, angle=angle)
+        sprite.scale = scale
+        return sprite
+
+    def release(self, sprite: Sprite) -> None:
+        sprite.color = HIDDEN
+        self.free[sprite.image].append(sprite)
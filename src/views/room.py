@@ -1,143 +1,161 @@
 import math
-from typing import Optional
+from typing import Any, Dict, Optional
 
-from wasabi2d import Scene
 from wasabi2d.sprites import Sprite
 
 import observer
-from views.layer_ids import FLOOR_LAYER
-from views.dimensions import ROOM_SPACING, ROOM_SIZE, DOORWAY_SIZE
+from views.floor import EAST_DOORWAY, FLOOR, SOUTH_DOORWAY, FloorMesh
+from views.pool import SpritePool
+from views.dimensions import ROOM_SPACING, ROOM_SIZE
 import world
 
+# Fields of the neighbor rooms that change how doorways look
+NEIGHBOR_FIELDS = {"seen", "door"}
+
 
 class RoomView:
     FLOOR_COLOR = ["#55555500", "#55555580", "#555555ff"]
 
-    def __init__(self, scene: Scene, room: world.Room) -> None:
-        floor = scene.layers[FLOOR_LAYER]
+    def __init__(self, room: world.Room, mesh: FloorMesh) -> None:
         self.room = room
-        # Base floor
-        self.floor = floor.add_rect(
-            width=ROOM_SIZE, height=ROOM_SIZE, fill=True, color=self.FLOOR_COLOR[0]
-        )
-        self.floor.pos = (room.x * ROOM_SPACING, room.y * ROOM_SPACING)
-
-        # Doorways (only east and south... north and west are drawn by the other room)
-        self.east_doorway = self.south_doorway = None
-        if world.Direction.EAST in room.neighbors:
-            self.east_doorway = floor.add_rect(
-                width=ROOM_SPACING - ROOM_SIZE, height=DOORWAY_SIZE, fill=True
-            )
-            self.east_doorway.pos = (
-                (room.x + 0.5) * ROOM_SPACING,
-                room.y * ROOM_SPACING,
-            )
-
-        if world.Direction.SOUTH in room.neighbors:
-            self.south_doorway = floor.add_rect(
-                width=DOORWAY_SIZE, height=ROOM_SPACING - ROOM_SIZE, fill=True
-            )
-            self.south_doorway.pos = (
-                room.x * ROOM_SPACING,
-                (room.y + 0.5) * ROOM_SPACING,
-            )
-
-        # stairs
-        self.stairs = None
-        if room.is_entrance():
-            self.stairs = floor.add_sprite("downstairs", pos=self.floor.pos)
-            self.stairs.scale = ROOM_SIZE / 64
-
-        if room.is_exit():
-            self.stairs = floor.add_sprite("upstairs", pos=self.floor.pos)
-            self.stairs.scale = ROOM_SIZE / 64
-
-        # Door
-        self.door = floor.add_sprite("door", pos=self.floor.pos)
-        self.door.scale = ROOM_SIZE / 200
-        if (
-            world.Direction.EAST in room.neighbors
-            or world.Direction.WEST in room.neighbors
-        ):
-            self.door.angle = math.pi / 2
-
-        # Trap
-        self.trap = floor.add_sprite("trap", pos=self.floor.pos)
-        self.trap.scale = 0.5
-
-        # Monster
-        self.monster = floor.add_sprite("monster", pos=self.floor.pos)
-        self.monster.scale = 0.15
-
-        # Treasure: this is created/destroyed in the notify function
-        self.treasure: Optional[Sprite] = None
-        self.treasure_kind: Optional[str] = None
+        self.pos = (room.x * ROOM_SPACING, room.y * ROOM_SPACING)
+        # Base floor and doorways (only east and south... north and west are
+        # drawn by the other room) are parts of the floor mesh
+        self.mesh = mesh
+        mesh.place(room.x, room.y)
+        exits = room.exits
+
+        # Decorations (stairs, door, trap, monster and treasure) are taken
+        # from the pool only while they are shown
+        self.pool = SpritePool.of(mesh.layer)
+        self.sprites: Dict[str, Sprite] = {}
+        self.door_angle = 0.0
+        if exits & (world.BIT[world.EAST] | world.BIT[world.WEST]):
+            self.door_angle = math.pi / 2
+
+        # Last color set on each floor part, so only changes touch the mesh
+        self.shown: Dict[int, Any] = {}
+
+        # Neighbors at the other side of the doorways
+        self.east_room: Optional[world.Room] = None
+        self.south_room: Optional[world.Room] = None
+        if exits & world.BIT[world.EAST]:
+            self.east_room = room.neighbor(world.EAST)
+        if exits & world.BIT[world.SOUTH]:
+            self.south_room = room.neighbor(world.SOUTH)
 
         # Initial update
         self.notify(room, {})
         room.register(self)
-        if self.east_doorway:
-            room.neighbors[world.Direction.EAST].register(self)
-        if self.south_doorway:
-            room.neighbors[world.Direction.SOUTH].register(self)
+        for neighbor in (self.east_room, self.south_room):
+            if neighbor is not None:
+                neighbor.register(self, fields=NEIGHBOR_FIELDS)
 
     def notify(self, obj: observer.Observable, message: observer.Message) -> None:
+        if obj is not self.room:
+            # A neighbor was seen, or its secret door found
+            self.update_doorways()
+            return
+        if not message or "seen" in message:
+            # Everything depends on the room being seen
+            self.update_floor()
+            self.update_doorways()
+            self.update_door()
+            self.update_trap()
+            self.update_monster()
+            self.update_treasure()
+            return
+        if "door" in message:
+            self.update_doorways()
+            self.update_door()
+        if "trap" in message:
+            self.update_trap()
+        if "monster" in message:
+            self.update_monster()
+        if "loot" in message:
+            self.update_treasure()
+
+    def set_color(self, part: int, color: Any) -> None:
+        if self.shown.get(part) != color:
+            self.shown[part] = color
+            self.mesh.set_color(self.room.x, self.room.y, part, color)
+
+    def show(
+        self, name: str, image: Optional[str], scale: float, angle: float = 0
+    ) -> None:
+        """Show decoration `name` with the given image, or hide it if None"""
+        sprite = self.sprites.get(name)
+        if sprite is not None:
+            if sprite.image == image:
+                return
+            self.pool.release(self.sprites.pop(name))
+        if image is not None:
+            self.sprites[name] = self.pool.acquire(image, self.pos, scale, angle)
+
+    def update_floor(self) -> None:
         room = self.room
-        # Show/Hide
-        self.floor.color = self.FLOOR_COLOR[2 * int(room.seen)]
-        if self.stairs:
-            self.stairs.color = (1, 1, 1, int(room.seen))
-        if self.east_doorway:
-            east_room = room.neighbors[world.Direction.EAST]
-            if east_room.visible and room.visible:
-                visible = int(room.seen) + int(east_room.seen)
-            else:
-                visible = 0
-            self.east_doorway.color = self.FLOOR_COLOR[visible]
-        if self.south_doorway:
-            south_room = room.neighbors[world.Direction.SOUTH]
-            if south_room.visible and room.visible:
-                visible = int(room.seen) + int(south_room.seen)
+        seen = int(room.seen)
+        self.set_color(FLOOR, self.FLOOR_COLOR[2 * seen])
+        stairs = None
+        if seen and room.is_exit():
+            stairs = "upstairs"
+        elif seen and room.is_entrance():
+            stairs = "downstairs"
+        self.show("stairs", stairs, ROOM_SIZE / 64)
+
+    def update_doorways(self) -> None:
+        room = self.room
+        for part, other in (
+            (EAST_DOORWAY, self.east_room),
+            (SOUTH_DOORWAY, self.south_room),
+        ):
+            if other is None:
+                continue
+            if other.visible and room.visible:
+                visible = int(room.seen) + int(other.seen)
             else:
                 visible = 0
-            self.south_doorway.color = self.FLOOR_COLOR[visible]
+            self.set_color(part, self.FLOOR_COLOR[visible])
+
+    def update_door(self) -> None:
+        room = self.room
         # Show door if present
-        self.door.color = (1, 1, 1, int(room.seen and room.door is not None))
+        visible = room.seen and room.door is not None
+        self.show("door", "door" if visible else None, ROOM_SIZE / 200, self.door_angle)
+
+    def update_trap(self) -> None:
+        room = self.room
         # Show trap if present and detected
-        self.trap.color = (
-            1,
-            1,
-            1,
-            int(room.seen and room.trap is not None and room.trap.hide_dc == 0),
-        )
+        trap = room.trap
+        visible = room.seen and trap is not None and trap.hide_dc == 0
+        self.show("trap", "trap" if visible else None, 0.5)
+
+    def update_monster(self) -> None:
+        room = self.room
         # Show monster if present
-        self.monster.color = (1, 1, 1, int(room.seen and room.monster is not None))
-        # Add treasure if present
-        visible_treasure = room.seen and room.loot is not None
-        # Remove treasure if disappeared or changed
-        if self.treasure is not None and (
-            not visible_treasure
-            or room.loot.kind.id != self.treasure_kind  # type: ignore
-        ):
-            self.treasure.delete()
-            self.treasure = None
-            self.trasure_kind = None
-        # Add treasure if missing
-        if visible_treasure and self.treasure is None:
-            layer = self.floor.layer
-            self.treasure = layer.add_sprite(
-                room.loot.kind.id, pos=self.floor.pos  # type: ignore
-            )
-            self.treasure.scale = 0.8
+        visible = room.seen and room.monster is not None
+        self.show("monster", "monster" if visible else None, 0.15)
 
-    def release(self) -> None:
+    def update_treasure(self) -> None:
         room = self.room
-        room.unregister(self)
-        if self.east_doorway:
-            room.neighbors[world.Direction.EAST].unregister(self)
-        if self.south_doorway:
-            room.neighbors[world.Direction.SOUTH].unregister(self)
-
-    @staticmethod
-    def clear_layers(scene: Scene) -> None:
-        scene.layers[FLOOR_LAYER].clear()
+        # Show treasure if present; its kind is the image
+        loot = room.loot
+        kind = loot.kind.id if room.seen and loot is not None else None
+        self.show("treasure", kind, 0.8)
+
+    def release(self) -> None:
+        self.room.unregister(self)
+        for neighbor in (self.east_room, self.south_room):
+            if neighbor is not None:
+                neighbor.unregister(self)
+
+    def delete(self) -> None:
+        """Release the view and remove it from the scene.
+
+        Decorations go back to the pool, for the views shown next.
+        """
+        self.release()
+        for sprite in self.sprites.values():
+            self.pool.release(sprite)
+        self.sprites = {}
+        self.mesh.hide(self.room.x, self.room.y)
@@ -0,0 +1,57 @@
+from typing import Any, Callable, Optional, Sequence, Tuple
+
+from wasabi2d.layers import Layer
+
+
+class Label:
+    """Text made from some values, laid out again only when they change"""
+
+    def __init__(
+        self, layer: Layer, template: Callable[..., str], **label_args: Any
+    ) -> None:
+        self.template = template
+        self.values: Optional[Tuple[Any, ...]] = None
+        self.label = layer.add_label("", **label_args)
+
+    def show(self, *values: Any) -> None:
+        if values != self.values:
+            self.values = values
+            self.label.text = self.template(*values)
+
+
+class StatBlock(Label):
+    """A label with a line for each value"""
+
+    def __init__(self, layer: Layer, lines: Sequence[str], **label_args: Any) -> None:
+        super().__init__(layer, "\n".join(lines).format, **label_args)
+
+
+class Meter:
+    """A bar filled up to a ratio, inside a frame.
+
+    The bar is a single rect scaled to the ratio, instead of a new rect for
+    each value.
+    """
+
+    def __init__(
+        self,
+        below: Layer,
+        above: Layer,
+        width: float,
+        height: float,
+        pos: Tuple[float, float],
+        colors: Callable[[float], Any],
+    ) -> None:
+        above.add_rect(width=width, height=height, pos=pos, fill=False)
+        self.bar = below.add_rect(width=width, height=height, pos=pos)
+        self.width = width
+        self.left = pos[0] - width / 2
+        self.colors = colors
+        self.ratio: Optional[float] = None
+
+    def show(self, ratio: float) -> None:
+        if ratio != self.ratio:
+            self.ratio = ratio
+            self.bar.scale_x = ratio
+            self.bar.x = self.left + self.width * ratio / 2
+            self.bar.color = self.colors(ratio)
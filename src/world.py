@@ -1,13 +1,43 @@
+from collections import OrderedDict
 from enum import Enum, auto
 import random
-from typing import Dict, List, Optional
+import struct
+from typing import (
+    AbstractSet,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+from weakref import WeakValueDictionary
+import zlib
 
 import game
+import levelpack
 import observer
+import pathfinding
+import store
+from store import LevelStore
 import treasure
+import trap
 from trap import Trap
 
 DOOR_TRAP_PROBABILITY = 0.6
+SIGHT_KEPT = 64  # Rooms with their sight() cached, per floor
+
+# Level.random densities
+OPENNESS = 0.1  # Ratio of rooms that get an extra wall removed
+DOOR_DENSITY = 0.6  # Ratio of valid door locations that get a door
+DOOR_SECRECY = 0.2  # Percentage of doors that are made secret
+TRAP_DENSITY = 0.05  # Ratio of free locations made a standalone trap
+MONSTER_DENSITY = 0.1  # Ratio of free locations made a monster
+LOOT_DENSITY = 0.1  # Ratio of free locations made treasure
 
 
 class Direction(Enum):
@@ -16,9 +46,31 @@ class Direction(Enum):
     EAST = (+1, 0)
     WEST = (-1, 0)
 
+    index: int  # Integer encoding, see below
+
     def opposite(self) -> "Direction":
-        x, y = self.value
-        return Direction((-x, -y))
+        return DIRECTIONS[OPPOSITE[self.index]]
+
+
+# Integer encoding of directions, to be used in the hot paths: the tables
+# below are indexed by Direction.index
+NORTH, SOUTH, EAST, WEST = range(4)
+DIRECTIONS = (Direction.NORTH, Direction.SOUTH, Direction.EAST, Direction.WEST)
+for _i, _d in enumerate(DIRECTIONS):
+    _d.index = _i
+del _i, _d
+DX = (0, 0, +1, -1)
+DY = (-1, +1, 0, 0)
+OPPOSITE = (SOUTH, NORTH, WEST, EAST)
+BIT = (1, 2, 4, 8)  # Bits in the LevelStore.exits masks
+
+# Number of exits, and direction indexes, in each exit mask
+EXIT_COUNT = tuple(bin(mask).count("1") for mask in range(16))
+EXIT_DIRECTIONS = tuple(
+    tuple(i for i, bit in enumerate(BIT) if mask & bit) for mask in range(16)
+)
+# Exit masks of rooms that can hold a door
+DOOR_EXITS = {BIT[NORTH] | BIT[SOUTH], BIT[EAST] | BIT[WEST]}
 
 
 class DoorKind(Enum):
@@ -27,16 +79,34 @@ class DoorKind(Enum):
     GOLD = auto()
 
 
-class Door(observer.Observable):
+SECRET_DOOR_DC = 10
+
 
-    OBSERVABLE_FIELDS = {"hide_dc"}
+class Door:
+    """The door in a room. Its state lives in the level store"""
 
     kind: DoorKind
-    hide_dc: int = 0  # Difficulty of finding if hidden. 0 if found or not hidden
     break_dc: int = 12
 
+    room: "Room"
+
+    def __init__(self, room: "Room") -> None:
+        self.room = room
+
+    @property
+    def code(self) -> int:
+        return self.room.store.terrain[self.room.cell]
+
+    @property
+    def hide_dc(self) -> int:
+        """Difficulty of finding if hidden. 0 if found or not hidden"""
+        return SECRET_DOOR_DC if self.code == store.SECRET_DOOR else 0
+
     def reveal(self) -> None:
-        self.hide_dc = 0
+        self.room.store.terrain[self.room.cell] = store.DOOR
+        self.room.level.forget_sight()
+        self.room.level.route_changed(self.room)
+        self.room.request_notify({"door": "changed"})
 
 
 class Monster:
@@ -51,36 +121,154 @@ class Monster:
         g.hero.take_damage(self.damage, game.DamageType.PHYSICAL)
 
 
+class Neighbors(Mapping[Direction, "Room"]):
+    """Read only mapping of the rooms connected to a room, by direction"""
+
+    __slots__ = ("room",)
+
+    def __init__(self, room: "Room") -> None:
+        self.room = room
+
+    def __getitem__(self, d: Direction) -> "Room":
+        if not self.room.exits & BIT[d.index]:
+            raise KeyError(d)
+        return self.room.neighbor(d.index)
+
+    def __contains__(self, d: object) -> bool:
+        return isinstance(d, Direction) and bool(self.room.exits & BIT[d.index])
+
+    def __iter__(self) -> Iterator[Direction]:
+        return (DIRECTIONS[i] for i in EXIT_DIRECTIONS[self.room.exits])
+
+    def __len__(self) -> int:
+        return EXIT_COUNT[self.room.exits]
+
+
 class Room(observer.Observable):
+    """A cell of a level. This is a view on the level store, which has the data"""
+
+    __slots__ = ("level", "store", "x", "y", "cell", "__weakref__")
 
     OBSERVABLE_FIELDS = {"seen", "trap", "door", "monster", "loot"}
 
     level: "Level"
+    store: LevelStore
     x: int
     y: int
+    cell: int  # Index in the store grids
 
-    neighbors: Dict[Direction, "Room"]
+    def __init__(self, level: "Level", x: int = 0, y: int = 0) -> None:
+        self.level = level
+        self.store = level.store
+        self.x = x
+        self.y = y
+        self.cell = self.store.cell(x, y)
+        super().__init__()
+
+    @property
+    def exits(self) -> int:
+        """Bit mask of the directions (BIT[i]) with no wall"""
+        return self.store.exits[self.cell]
+
+    def neighbor(self, i: int) -> "Room":
+        """Room towards direction index i. There must be an exit that way"""
+        return self.level.room_at(self.cell + self.level.offsets[i])
+
+    # Observed rooms are kept alive by the level, so observers keep getting
+    # notifications from the same room object
+
+    def register(
+        self, observer: observer.Observer, fields: Optional[AbstractSet[str]] = None
+    ) -> None:
+        super().register(observer, fields)
+        self.level.observed.add(self)
+
+    def unregister(self, observer: observer.Observer) -> None:
+        super().unregister(observer)
+        if not self.observers:
+            self.level.observed.discard(self)
+
+    @property
+    def neighbors(self) -> Neighbors:
+        return Neighbors(self)
 
     # Doors
-    door: Optional[Door] = None  # None means no door
+
+    @property
+    def door(self) -> Optional[Door]:
+        """None means no door"""
+        if self.store.terrain[self.cell] == store.FLOOR:
+            return None
+        return Door(self)
+
+    @door.setter
+    def door(self, value: Optional[Door]) -> None:
+        self.store.terrain[self.cell] = store.FLOOR if value is None else value.code
+        self.level.forget_sight()
+        self.level.route_changed(self)
 
     # Traps
-    trap: Optional[Trap] = None  # None means no trap
+
+    @property
+    def trap(self) -> Optional[Trap]:
+        """None means no trap"""
+        return Trap(self) if self.store.traps[self.cell] else None
+
+    @trap.setter
+    def trap(self, value: Optional[Trap]) -> None:
+        self.store.traps[self.cell] = 0 if value is None else value.code
+        self.level.route_changed(self)
 
     # Monsters
-    monster: Optional[Monster] = None  # None means no monster
+
+    @property
+    def monster(self) -> Optional[Monster]:
+        """None means no monster"""
+        return Monster() if self.store.monsters[self.cell] else None
+
+    @monster.setter
+    def monster(self, value: Optional[Monster]) -> None:
+        self.store.monsters[self.cell] = value is not None
+        self.level.route_changed(self)
 
     # Treasure
-    loot: Optional[treasure.Item] = None
 
-    seen: bool = False
+    @property
+    def loot(self) -> Optional[treasure.Item]:
+        code = self.store.loot[self.cell]
+        if not code:
+            return None
+        item = treasure.Item(treasure.decode(code).id)
+        item.amount = self.store.loot_amounts.get(self.cell, 1)
+        return item
 
-    def __init__(self, level: "Level", x: int = 0, y: int = 0) -> None:
-        self.neighbors = {}
-        self.level = level
-        self.x = x
-        self.y = y
-        super().__init__()
+    @loot.setter
+    def loot(self, value: Optional[treasure.Item]) -> None:
+        self.store.loot_amounts.pop(self.cell, None)
+        if value is None:
+            self.store.loot[self.cell] = 0
+        else:
+            self.store.loot[self.cell] = treasure.encode(value.kind)
+            if value.amount != 1:
+                self.store.loot_amounts[self.cell] = value.amount
+
+    @property
+    def seen(self) -> bool:
+        return bool(self.store.seen[self.cell])
+
+    @seen.setter
+    def seen(self, value: bool) -> None:
+        st = self.store
+        new = int(value)
+        old = st.seen[self.cell]
+        if new != old:
+            st.seen[self.cell] = new
+            st.explored += new - old
+            log = self.level.newly_seen
+            if log is not None and new:
+                log.append((self.x, self.y))
+            self.level.saw(self)
+            self.level.route_changed(self)
 
     @property
     def allows_sight(self) -> bool:
@@ -90,34 +278,34 @@ class Room(observer.Observable):
     @property
     def visible(self) -> bool:
         """True if it's possible to see this square"""
-        return self.door is None or self.door.hide_dc == 0
+        return self.store.terrain[self.cell] != store.SECRET_DOOR
 
     def reveal_hidden(self, check: int) -> None:
-        if self.door:
+        door = self.door
+        if door:
             # we nest the conditions. If there's a door we can't find a trap within from a
             # neighbor square; we need to check it from within
-            if 0 < self.door.hide_dc <= check:
-                self.door.reveal()
+            if 0 < door.hide_dc <= check:
+                door.reveal()
         else:
             self.reveal_traps(check)
 
     def reveal_traps(self, check: int) -> None:
-        if self.trap and 0 < self.trap.hide_dc <= check:
-            self.trap.reveal()
+        trap = self.trap
+        if trap and 0 < trap.hide_dc <= check:
+            trap.reveal()
 
     def look(self) -> None:
-        self.seen = True
+        if not self.seen:
+            self.seen = True
 
     def validate(self) -> None:
         if self.door:
-            if len(self.neighbors) != 2:
+            if EXIT_COUNT[self.exits] != 2:
                 raise ValueError(
                     f"room[{self.y}][{self.x}]: doors should have exactly 2 exits!"
                 )
-            d0, d1 = self.neighbors.keys()
-            d0x, d0y = d0.value
-            d1x, d1y = d1.value
-            if d0x * d1x + d0y * d1y == 0:
+            if self.exits not in DOOR_EXITS:
                 raise ValueError(
                     f"room[{self.y}][{self.x}]: doors should have 2 opposite exits!"
                 )
@@ -129,17 +317,53 @@ class Room(observer.Observable):
         return self.level.exit is self
 
 
-def _inside(room: Room, d: Direction, width: int, height: int) -> bool:
-    rx, ry = room.x, room.y
-    dx, dy = d.value  # type: int, int
-    return (0 <= rx + dx < width) and (0 <= ry + dy < height)
+def _inside(x: int, y: int, i: int, width: int, height: int) -> bool:
+    return (0 <= x + DX[i] < width) and (0 <= y + DY[i] < height)
+
+
+_STAIRS = struct.Struct("<II")  # entrance and exit cells
+
+# Level._parse tables, over map characters
+_MAP_OPENINGS = [bytes(bit if c == ord(" ") else 0 for c in range(256)) for bit in BIT]
+_MAP_TERRAIN = bytes(
+    {ord("#"): store.DOOR, ord("S"): store.SECRET_DOOR}.get(c, store.FLOOR)
+    for c in range(256)
+)
+_MAP_MONSTERS = bytes(int(c == ord("M")) for c in range(256))
+_MAP_KNOWN = b" #S<>^M$"
+_MAP_DOORS = b"#S"
+_MAP_ENTRANCE, _MAP_EXIT, _MAP_TRAP, _MAP_LOOT = b"<>^$"
+_MAP_SPECIAL = b"#S<>^$"
 
 
 class Level:
+    """A floor of the tower.
+
+    The contents live in a compact LevelStore. Room objects are created on
+    demand when first asked for, and only kept while something else
+    references them, or while they are observed.
+    """
+
+    store: LevelStore
     entrance: Room
     exit: Room
+    number: int = 0  # Floor in the World, from the ground up
 
-    def __init__(self, name: str) -> None:
+    offsets: Tuple[int, ...]  # Cell offset towards each direction index
+    _rooms: MutableMapping[int, Room]  # Weak, see Room.register
+    observed: Set[Room]
+    _sight: Dict[Room, Tuple[Room, ...]]  # Cache for sight()
+    # Distance fields by target position, see pathfinding.distance_field
+    fields: "Dict[Tuple[int, int], pathfinding.DistanceField]"
+    # Positions of unseen rooms next to seen ones; None until needed
+    _frontier: Optional[Set[Tuple[int, int]]]
+    # Positions of the rooms seen since taken, if someone keeps track (see
+    # savegame.Autosave); None otherwise
+    newly_seen: Optional[List[Tuple[int, int]]]
+
+    def __init__(self, name: str, rng: Optional[random.Random] = None) -> None:
+        """Load maps/`name`.map; doors get traps and loot gets its kind from
+        `rng` (a new random stream if not given)"""
         filename = f"maps/{name}.map"
         with open(filename, "r") as f:
             lines = f.readlines()
@@ -158,175 +382,806 @@ class Level:
                 f"Malformed map, some lines have width different to {width}"
             )
 
-        grid = [
-            [Room(self, x, y) for x in range(width // 2 - 1)]
-            for y in range(height // 2)
-        ]
+        self._setup(LevelStore(width // 2 - 1, height // 2))
+        self._parse(lines, rng if rng is not None else random.Random())
+
+    def _parse(self, lines: List[str], rng: random.Random) -> None:
+        """Fill the store from the lines of a .map file.
+
+        Each row of rooms is decoded at once with bytes operations: walls
+        through translate tables and big integers used as bit vectors,
+        terrain and monsters through translate. Only rooms with something
+        random in them (doors, traps, loot) or stairs are visited one by one,
+        in the same column by column order as always, so a given `rng` state
+        still produces the same level.
+        """
+        st = self.store
+        width = st.width
+        data = [line.encode("ascii", "replace") for line in lines]
+        # Rooms to visit, as (x, y, room type)
+        special: List[Tuple[int, int, int]] = []
+        for y in range(st.height):
+            ry = 2 * y + 1
+            row = slice(y * width, (y + 1) * width)
+            # Parse walls: a space means there is no wall, connect rooms
+            exits = 0
+            for i, table in enumerate(_MAP_OPENINGS):
+                rx = 1 + DX[i]
+                walls = data[ry + DY[i]][rx : rx + 2 * width : 2]
+                exits |= int.from_bytes(walls.translate(table), "big")
+            st.exits[row] = exits.to_bytes(width, "big")
+            # Parse room terrain
+            rooms = data[ry][1 : 2 * width + 1 : 2]
+            st.terrain[row] = rooms.translate(_MAP_TERRAIN)
+            st.monsters[row] = rooms.translate(_MAP_MONSTERS)
+            for c in _MAP_SPECIAL:
+                x = rooms.find(c)
+                while x >= 0:
+                    special.append((x, y, c))
+                    x = rooms.find(c, x + 1)
+            if rooms.translate(None, _MAP_KNOWN):
+                x = next(x for x, c in enumerate(rooms) if c not in _MAP_KNOWN)
+                special.append((x, y, 0))  # Unknown, reported if reached
 
+        exit: Optional[Room] = None
         # set a default entrance
-        self.entrance = grid[0][0]
-
-        for x in range(width // 2 - 1):
-            rx = 2 * x + 1
-            for y in range(height // 2):
-                ry = 2 * y + 1
-                room = grid[y][x]
-                # Parse walls
-                for d in Direction:
-                    dx, dy = d.value
-                    if lines[ry + dy][rx + dx] == " ":
-                        # There is no wall in given direction, connect rooms
-                        room.neighbors[d] = grid[y + dy][x + dx]
-                # Parse room terrain
-                terrain = lines[ry][rx]
-                if terrain == "#":  # Door
-                    room.door = Door()
-                    if random.random() <= DOOR_TRAP_PROBABILITY:
-                        room.trap = Trap()
-                elif terrain == "S":  # Secret door
-                    room.door = Door()
-                    room.door.hide_dc = 10
-                    if random.random() <= DOOR_TRAP_PROBABILITY:
-                        room.trap = Trap()
-                elif terrain == "<":  # Staircase down
-                    self.entrance = room
-                elif terrain == ">":  # Staircase up
-                    self.exit = room
-                elif terrain == " ":
-                    pass
-                elif terrain == "^":  # Standalone Trap
-                    room.trap = Trap()
-                elif terrain == "M":  # Monster
-                    room.monster = Monster()
-                elif terrain == "$":  # Random treasure
-                    room.loot = treasure.Item.random()
-                else:
-                    raise ValueError(
-                        f"line {ry+1} char {rx+1}: unknown room type {terrain!r}"
-                    )
-                room.validate()
-        if "exit" not in vars(self):
+        self.entrance = self.room(0, 0)
+        random_trap = trap.kind_picker(rng)
+        random_loot = treasure.kind_picker(rng)
+        special.sort()
+        for x, y, c in special:
+            cell = y * width + x
+            if c in _MAP_DOORS:
+                if rng.random() <= DOOR_TRAP_PROBABILITY:
+                    st.traps[cell] = trap.encode(random_trap())
+                if st.exits[cell] not in DOOR_EXITS:
+                    self.room_at(cell).validate()  # Raises with the details
+            elif c == _MAP_ENTRANCE:
+                self.entrance = self.room_at(cell)
+            elif c == _MAP_EXIT:
+                exit = self.room_at(cell)
+            elif c == _MAP_TRAP:
+                st.traps[cell] = trap.encode(random_trap())
+            elif c == _MAP_LOOT:
+                st.loot[cell] = treasure.encode(random_loot())
+            else:
+                ry, rx = 2 * y + 1, 2 * x + 1
+                raise ValueError(
+                    f"line {ry+1} char {rx+1}: unknown room type {lines[ry][rx]!r}"
+                )
+        if exit is None:
             raise ValueError("Map has no exit!")
+        self.exit = exit
 
-    @classmethod
-    def random(cls, width: int = 24, height: int = 15) -> "Level":
-        OPENNESS = 0.1  # Ratio of rooms that get an extra wall removed
-        DOOR_DENSITY = 0.6  # Ratio of valid door locations that get a door
-        DOOR_SECRECY = 0.2  # Percentage of doors that are made secret
-        TRAP_DENSITY = 0.05  # Ratio of free locations made a standalone trap
-        MONSTER_DENSITY = 0.1  # Ratio of free locations made a monster
-        LOOT_DENSITY = 0.1  # Ratio of free locations made treasure
+    def _setup(self, store: LevelStore) -> None:
+        self.store = store
+        width = store.width
+        self.offsets = tuple(DX[i] + DY[i] * width for i in range(len(BIT)))
+        self._rooms = WeakValueDictionary()
+        self.observed = set()
+        self._sight = {}
+        self._frontier = None
+        self.newly_seen = None
+        self.fields = {}
+
+    @property
+    def width(self) -> int:
+        return self.store.width
+
+    @property
+    def height(self) -> int:
+        return self.store.height
 
+    def room(self, x: int, y: int) -> Room:
+        """The room at the given position"""
+        return self.room_at(self.store.cell(x, y))
+
+    def room_at(self, cell: int) -> Room:
+        """The room at the given store cell"""
+        room = self._rooms.get(cell)
+        if room is None:
+            y, x = divmod(cell, self.store.width)
+            room = self._rooms[cell] = Room(self, x, y)
+        return room
+
+    @classmethod
+    def random(
+        cls, width: int = 24, height: int = 15, rng: Optional[random.Random] = None
+    ) -> "Level":
+        """Generate a random level from `rng` (a new random stream if not
+        given). Takes time linear in width × height"""
+        if rng is None:
+            rng = random.Random()
         # 0. Create grid
         self: Level = object.__new__(cls)
-        grid = [[Room(self, x, y) for x in range(width)] for y in range(height)]
-        self.entrance = grid[0][0]
-        self.exit = grid[height - 1][width - 1]
-
-        # 1. Connect rooms until getting a spanning tree
-        connected = {(0, 0)}
-        frontier = [(0, 0)]
-        while len(connected) < width * height:
-            random.shuffle(frontier)
-            fx, fy = frontier[-1]
-            # compute neighbors
-            neighbors = []
-            if fx + 1 < width and (fx + 1, fy) not in connected:
-                neighbors.append((fx + 1, fy, Direction.EAST))
-            if fx - 1 >= 0 and (fx - 1, fy) not in connected:
-                neighbors.append((fx - 1, fy, Direction.WEST))
-            if fy + 1 < height and (fx, fy + 1) not in connected:
-                neighbors.append((fx, fy + 1, Direction.SOUTH))
-            if fy - 1 >= 0 and (fx, fy - 1) not in connected:
-                neighbors.append((fx, fy - 1, Direction.NORTH))
-            if neighbors:
-                nx, ny, d = random.choice(neighbors)
-                new_room = grid[ny][nx]
-                grid[fy][fx].neighbors[d] = new_room
-                new_room.neighbors[d.opposite()] = grid[fy][fx]
-                connected.add((nx, ny))
-                frontier.append((nx, ny))
+        self._setup(LevelStore(width, height))
+        st = self.store
+        exits = st.exits
+        size = width * height
+        rand = rng.random
+
+        # 1. Connect rooms until getting a spanning tree. Each step grows the
+        # tree from a random frontier room; rooms with nothing left to
+        # connect are dropped from the frontier by swapping with the last one.
+        # This works on a copy of the grid with a border of already connected
+        # cells, which saves bounds checks
+        padded_width = width + 2
+        connected = bytearray([1]) * (padded_width * (height + 2))
+        for y in range(height):
+            start = (y + 1) * padded_width + 1
+            connected[start : start + width] = bytes(width)
+        padded_exits = bytearray(len(connected))
+        north, south, east, west = steps = (-padded_width, padded_width, 1, -1)
+        first = padded_width + 1
+        connected[first] = 1
+        frontier = [first]
+        append = frontier.append
+        while frontier:
+            k = int(rand() * len(frontier))
+            f = frontier[k]
+            # compute neighbors, as a mask of the directions not connected yet
+            neighbors = EXIT_DIRECTIONS[
+                (connected[f + north] ^ 1)
+                | (connected[f + south] ^ 1) << 1
+                | (connected[f + east] ^ 1) << 2
+                | (connected[f + west] ^ 1) << 3
+            ]
+            if len(neighbors) > 1:
+                d = neighbors[int(rand() * len(neighbors))]
+            elif neighbors:
+                # Connecting the last neighbor left; f is done after this
+                d = neighbors[0]
+                frontier[k] = frontier[-1]
+                frontier.pop()
             else:
+                frontier[k] = frontier[-1]
                 frontier.pop()
+                continue
+            n = f + steps[d]
+            padded_exits[f] |= BIT[d]
+            padded_exits[n] |= BIT[OPPOSITE[d]]
+            connected[n] = 1
+            append(n)
+        for y in range(height):
+            start = (y + 1) * padded_width + 1
+            exits[y * width : (y + 1) * width] = padded_exits[start : start + width]
 
         # 2. Break down more walls to open it up a bit
-        rooms: List[Room] = sum(grid, [])
-        for _ in range(int(width * height * OPENNESS)):
-            r = random.choice(rooms)
+        for _ in range(int(size * OPENNESS)):
+            c = int(rand() * size)
+            y, x = divmod(c, width)
             walls = [
-                d
-                for d in Direction
-                if d not in r.neighbors and _inside(r, d, width, height)
+                i
+                for i, bit in enumerate(BIT)
+                if not exits[c] & bit and _inside(x, y, i, width, height)
             ]
             if walls:
                 # tear down random wall w
-                w = random.choice(walls)
-                dx, dy = w.value
-                n = grid[r.y + dy][r.x + dx]
-                r.neighbors[w] = n
-                n.neighbors[w.opposite()] = r
+                w = rng.choice(walls)
+                exits[c] |= BIT[w]
+                exits[c + self.offsets[w]] |= BIT[OPPOSITE[w]]
+
+        # Locations are picked with rng.sample, which takes time
+        # proportional to the amount picked instead of the level size.
+        # Entrance (first cell) and exit (last cell) are always left free
 
         # 3. Add doors
-        rooms.remove(self.exit)
-        rooms.remove(self.entrance)
-        random.shuffle(rooms)
-        valid_door_locations = [
-            r
-            for r in rooms
-            if len(r.neighbors) == 2
-            and tuple(r.neighbors.keys())[0] == tuple(r.neighbors.keys())[1].opposite()
-        ]
+        valid_door_locations = [c for c in range(1, size - 1) if exits[c] in DOOR_EXITS]
         door_count = int(len(valid_door_locations) * DOOR_DENSITY)
-        for _ in range(door_count):
-            r = valid_door_locations.pop()
-            r.door = Door()
-            if random.random() <= DOOR_SECRECY:
-                r.door.hide_dc = 10
-            if random.random() <= DOOR_TRAP_PROBABILITY:
-                r.trap = Trap()
-            rooms.remove(r)
-
-        # 4. Add traps
-        trap_count = int(len(rooms) * TRAP_DENSITY)
-        for _ in range(trap_count):
-            r = rooms.pop()
-            r.trap = Trap()
+        trapped = []
+        for c in rng.sample(valid_door_locations, door_count):
+            st.terrain[c] = store.DOOR
+            if rand() <= DOOR_SECRECY:
+                st.terrain[c] = store.SECRET_DOOR
+            if rand() <= DOOR_TRAP_PROBABILITY:
+                trapped.append(c)
+
+        free = [c for c in range(1, size - 1) if st.terrain[c] == store.FLOOR]
+        trap_count = int(len(free) * TRAP_DENSITY)
+        monster_count = int((len(free) - trap_count) * MONSTER_DENSITY)
+        loot_count = int((len(free) - trap_count - monster_count) * LOOT_DENSITY)
+        picked = rng.sample(free, trap_count + monster_count + loot_count)
+
+        # 4. Add traps (the standalone ones, and the ones in doors)
+        trapped += picked[:trap_count]
+        for c, kind in zip(trapped, trap.random_kinds(len(trapped), rng)):
+            st.traps[c] = trap.encode(kind)
 
         # 5. Add monsters
-        monster_count = int(len(rooms) * MONSTER_DENSITY)
-        for _ in range(monster_count):
-            r = rooms.pop()
-            r.monster = Monster()
+        for c in picked[trap_count : trap_count + monster_count]:
+            st.monsters[c] = 1
 
         # 6. Add loot
-        loot_count = int(len(rooms) * LOOT_DENSITY)
-        for _ in range(loot_count):
-            r = rooms.pop()
-            r.loot = treasure.Item.random()
+        random_loot = treasure.kind_picker(rng)
+        for c in picked[trap_count + monster_count :]:
+            st.loot[c] = treasure.encode(random_loot())
 
+        self.entrance = self.room(0, 0)
+        self.exit = self.room(width - 1, height - 1)
         return self
 
+    def focus(self, room: Room) -> None:
+        """Called when the hero gets to `room`"""
+        pass
+
+    def sight(self, room: Room) -> Tuple[Room, ...]:
+        """Rooms that can be seen from `room`.
+
+        That's the room itself, and the straight lines through open walls
+        in each direction, up to the first door (if it's not secret). The
+        result is cached until a door changes, for the SIGHT_KEPT rooms most
+        recently looked from (the cache keeps its rooms alive).
+        """
+        rooms = self._sight.pop(room, None)
+        if rooms is None:
+            if len(self._sight) >= SIGHT_KEPT:
+                # Forget the least recently used
+                del self._sight[next(iter(self._sight))]
+            seen = [room]
+            for i, bit in enumerate(BIT):
+                r = room
+                while r.allows_sight and r.exits & bit:
+                    r = r.neighbor(i)
+                    if r.visible:
+                        seen.append(r)
+            rooms = tuple(seen)
+        self._sight[room] = rooms  # Most recently used last
+        return rooms
+
+    def forget_sight(self) -> None:
+        """Drop the sight() cache; needed whenever a door changes"""
+        self._sight.clear()
+
+    def route_changed(self, room: Room) -> None:
+        """Called when something that affects routes changes in `room`"""
+        for field in self.fields.values():
+            field.changed(room)
+
+    @property
+    def explored(self) -> float:
+        """Fraction of the rooms that have been seen"""
+        return self.store.explored / len(self.store)
+
+    def frontier(self) -> Set[Tuple[int, int]]:
+        """Positions of the unseen rooms with an exit to a seen room.
+
+        Secret doors are included, check Room.visible if that matters. This
+        is worked out from the store once, and then kept up to date as rooms
+        are seen; don't modify it.
+        """
+        if self._frontier is None:
+            self._frontier = self._find_frontier()
+        return self._frontier
+
+    def _find_frontier(self) -> Set[Tuple[int, int]]:
+        st = self.store
+        seen = st.seen
+        width = st.width
+        frontier = set()
+        cell = seen.find(1)
+        while cell >= 0:
+            exits = st.exits[cell]
+            for i, bit in enumerate(BIT):
+                n = cell + self.offsets[i]
+                if exits & bit and not seen[n]:
+                    frontier.add((n % width, n // width))
+            cell = seen.find(1, cell + 1)
+        return frontier
+
+    def saw(self, room: Room) -> None:
+        """Called when room.seen changes, to keep the frontier"""
+        frontier = self._frontier
+        if frontier is None:
+            return
+        if not room.seen:
+            # Doesn't happen in a game, just start over
+            self._frontier = None
+            return
+        frontier.discard((room.x, room.y))
+        exits = room.exits
+        for i, bit in enumerate(BIT):
+            if exits & bit:
+                n = room.neighbor(i)
+                if not n.seen:
+                    frontier.add((n.x, n.y))
+
+    # Seen rooms by region. A Level is a single region, (0, 0); ChunkedLevel
+    # has many. Saved games use these to keep track of what was seen
+
+    def seen_regions(self) -> Dict[Tuple[int, int], int]:
+        """Number of seen rooms of each region with any"""
+        explored = self.store.explored
+        return {(0, 0): explored} if explored else {}
+
+    def seen_bits(self, region: Tuple[int, int]) -> bytes:
+        """The seen rooms of `region`, see LevelStore.seen_bits"""
+        return self.store.seen_bits()
+
+    def set_seen_bits(self, region: Tuple[int, int], data: bytes) -> None:
+        """Inverse of seen_bits"""
+        self.store.set_seen_bits(data)
+        self._frontier = None
+        self.fields.clear()
+
+    def to_bytes(self) -> bytes:
+        """Serialize the level contents, see from_bytes"""
+        stairs = _STAIRS.pack(self.entrance.cell, self.exit.cell)
+        return stairs + self.store.to_bytes()
+
+    def serializer(self) -> Callable[[], bytes]:
+        """to_bytes() in two steps, to save in the background.
+
+        The level is copied as it is now, and the function returned
+        serializes that copy; it may be called from another thread.
+        """
+        data = self.to_bytes()
+        return lambda: data
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "Level":
+        self: Level = object.__new__(cls)
+        entrance, exit = _STAIRS.unpack_from(data)
+        self._setup(LevelStore.from_bytes(data, _STAIRS.size))
+        self.entrance = self.room_at(entrance)
+        self.exit = self.room_at(exit)
+        return self
+
+
+class ChunkRoom(Room):
+    """A room of a ChunkedLevel.
+
+    It looks its region up on every access instead of keeping a store, so it
+    remains valid while its region is evicted and loaded again.
+    """
+
+    __slots__ = ()
+
+    level: "ChunkedLevel"
+
+    def __init__(self, level: "ChunkedLevel", x: int, y: int) -> None:
+        observer.Observable.__init__(self)
+        self.level = level
+        self.x = x
+        self.y = y
+        size = level.chunk_size
+        cx, cy = x // size, y // size
+        self.cell = (y - cy * size) * level.region_width(cx) + (x - cx * size)
+
+    @property
+    def store(self) -> LevelStore:  # type: ignore  # Replaces the Room.store slot
+        size = self.level.chunk_size
+        return self.level.region(self.x // size, self.y // size)
+
+    def neighbor(self, i: int) -> Room:
+        return self.level.room(self.x + DX[i], self.y + DY[i])
+
+
+CHUNK_SIZE = 32  # Side of the regions of a ChunkedLevel
+CHUNK_RADIUS = 1  # Regions kept loaded around the hero's, in each direction
+_CHUNKED = struct.Struct("<IIIII")  # width, height, seed, chunk size, regions
+_REGION = struct.Struct("<IIII")  # cx, cy, explored, compressed size
+
+
+class ChunkedLevel(Level):
+    """A huge floor, split in square regions that are only kept in memory
+    around the hero.
+
+    A region is generated the first time it's needed, from the level seed
+    and its position, as a small random level connected to each neighbor
+    region through one opening. When the hero gets far from it, its store is
+    compressed and put aside, and restored from there when needed again;
+    so everything that happened there (seen rooms, opened doors, killed
+    monsters, picked loot) is kept.
+
+    Rooms are only kept while something else references them, or while
+    they are observed.
+    """
+
+    seed: int
+    chunk_size: int
+    regions: Dict[Tuple[int, int], LevelStore]  # Loaded
+    evicted: Dict[Tuple[int, int], bytes]  # Compressed LevelStore.to_bytes()
+    evicted_explored: Dict[Tuple[int, int], int]  # LevelStore.explored, if not 0
+    loads: int  # Changes every time a region is loaded or evicted
+
+    def __init__(
+        self, width: int, height: int, seed: int, chunk_size: int = CHUNK_SIZE
+    ) -> None:
+        self._width = width
+        self._height = height
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.chunks_x = -(-width // chunk_size)
+        self.chunks_y = -(-height // chunk_size)
+        self.regions = {}
+        self.evicted = {}
+        self.evicted_explored = {}
+        self.loads = 0
+        self.observed = set()
+        self._rooms = WeakValueDictionary()
+        self._sight = {}
+        self._frontier = None
+        self.newly_seen = None
+        self.fields = {}
+        self.entrance = self.room(0, 0)
+        self.exit = self.room(width - 1, height - 1)
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    def room(self, x: int, y: int) -> Room:
+        cell = y * self._width + x
+        room = self._rooms.get(cell)
+        if room is None:
+            room = self._rooms[cell] = ChunkRoom(self, x, y)
+        return room
+
+    def room_at(self, cell: int) -> Room:
+        y, x = divmod(cell, self._width)
+        return self.room(x, y)
+
+    def region_width(self, cx: int) -> int:
+        return min(self.chunk_size, self._width - cx * self.chunk_size)
+
+    def region_height(self, cy: int) -> int:
+        return min(self.chunk_size, self._height - cy * self.chunk_size)
+
+    def region(self, cx: int, cy: int) -> LevelStore:
+        """The store of region (cx, cy), loading it if needed"""
+        key = (cx, cy)
+        st = self.regions.get(key)
+        if st is None:
+            data = self.evicted.pop(key, None)
+            if data is None:
+                st = self._generate(cx, cy)
+            else:
+                st = LevelStore.from_bytes(zlib.decompress(data))
+                self.evicted_explored.pop(key, None)
+            self.regions[key] = st
+            self.loads += 1
+        return st
+
+    def focus(self, room: Room) -> None:
+        cx, cy = room.x // self.chunk_size, room.y // self.chunk_size
+        r = CHUNK_RADIUS
+        # Regions are evicted a bit further than they are loaded, so walking
+        # back and forth over a region border doesn't keep reloading them
+        for key in list(self.regions):
+            if max(abs(key[0] - cx), abs(key[1] - cy)) > r + 1:
+                st = self.regions.pop(key)
+                self.evicted[key] = zlib.compress(st.to_bytes())
+                if st.explored:
+                    self.evicted_explored[key] = st.explored
+                self.loads += 1
+                # Let go of the rooms there
+                self.forget_sight()
+        for y in range(max(cy - r, 0), min(cy + r + 1, self.chunks_y)):
+            for x in range(max(cx - r, 0), min(cx + r + 1, self.chunks_x)):
+                self.region(x, y)
+
+    def _generate(self, cx: int, cy: int) -> LevelStore:
+        width, height = self.region_width(cx), self.region_height(cy)
+        rng = random.Random(f"{self.seed}/{cx}/{cy}")
+        st = Level.random(width, height, rng).store
+        # Open the links to the neighbor regions
+        for i, bit in enumerate(BIT):
+            if not (
+                0 <= cx + DX[i] < self.chunks_x and 0 <= cy + DY[i] < self.chunks_y
+            ):
+                continue
+            if DX[i]:
+                # Links are named after the region to the west/north
+                y = self._link(min(cx, cx + DX[i]), cy, "east", height)
+                x = width - 1 if i == EAST else 0
+            else:
+                x = self._link(cx, min(cy, cy + DY[i]), "south", width)
+                y = height - 1 if i == SOUTH else 0
+            cell = st.cell(x, y)
+            st.exits[cell] |= bit
+            # Doors are only valid with two opposite exits
+            st.terrain[cell] = store.FLOOR
+            st.traps[cell] = 0
+        return st
+
+    @property
+    def explored(self) -> float:
+        cells = sum(st.explored for st in self.regions.values())
+        cells += sum(self.evicted_explored.values())
+        return cells / (self._width * self._height)
+
+    def _find_frontier(self) -> Set[Tuple[int, int]]:
+        # Regions with seen rooms must be loaded for this; they'll be evicted
+        # again as the hero moves
+        for key in list(self.evicted_explored):
+            self.region(*key)
+        frontier: Set[Tuple[int, int]] = set()
+        self._frontier = frontier
+        size = self.chunk_size
+        for (cx, cy), st in list(self.regions.items()):
+            cell = st.seen.find(1)
+            while cell >= 0:
+                y, x = divmod(cell, st.width)
+                self.saw(self.room(cx * size + x, cy * size + y))
+                cell = st.seen.find(1, cell + 1)
+        return frontier
+
+    def seen_regions(self) -> Dict[Tuple[int, int], int]:
+        regions = dict(self.evicted_explored)
+        regions.update((key, st.explored) for key, st in self.regions.items())
+        return {key: explored for key, explored in regions.items() if explored}
+
+    def seen_bits(self, region: Tuple[int, int]) -> bytes:
+        st = self.regions.get(region)
+        if st is None:
+            # Read it without loading it, the hero is far away
+            st = LevelStore.from_bytes(zlib.decompress(self.evicted[region]))
+        return st.seen_bits()
+
+    def set_seen_bits(self, region: Tuple[int, int], data: bytes) -> None:
+        self.region(*region).set_seen_bits(data)
+        self._frontier = None
+        self.fields.clear()
+
+    def to_bytes(self) -> bytes:
+        """Serialize the level, with all its regions compressed"""
+        return self.serializer()()
+
+    def serializer(self) -> Callable[[], bytes]:
+        # Evicted regions are already compressed; the loaded ones are copied
+        # now, and compressed by the function returned
+        regions = {
+            key: (self.evicted_explored.get(key, 0), data, False)
+            for key, data in self.evicted.items()
+        }
+        for key, st in self.regions.items():
+            regions[key] = (st.explored, st.to_bytes(), True)
+        header = _CHUNKED.pack(
+            self._width, self._height, self.seed, self.chunk_size, len(regions)
+        )
+
+        def serialize() -> bytes:
+            parts = [header]
+            for (cx, cy), (explored, data, loaded) in regions.items():
+                if loaded:
+                    data = zlib.compress(data)
+                parts.append(_REGION.pack(cx, cy, explored, len(data)))
+                parts.append(data)
+            return b"".join(parts)
+
+        return serialize
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "ChunkedLevel":
+        width, height, seed, chunk_size, count = _CHUNKED.unpack_from(data)
+        self = cls(width, height, seed, chunk_size)
+        pos = _CHUNKED.size
+        for _ in range(count):
+            cx, cy, explored, size = _REGION.unpack_from(data, pos)
+            pos += _REGION.size
+            self.evicted[cx, cy] = data[pos : pos + size]
+            if explored:
+                self.evicted_explored[cx, cy] = explored
+            pos += size
+        return self
+
+    def _link(self, cx: int, cy: int, side: str, length: int) -> int:
+        """Position along the border of the link on `side` of region (cx, cy)"""
+        return random.Random(f"{self.seed}/{cx}/{cy}/{side}").randrange(length)
+
+
+FLOORS = 6  # Height of the spire
+ENDLESS = False  # Endless spire mode: no top floor, play until time runs out
+LIVE_FLOORS = 3  # Floors kept ready to play; the others are compacted
+# Compacted floors further than this from the current one are evicted, and
+# generated again from scratch if the hero ever gets back there
+KEPT_FLOORS = 20
+LEVEL_SIZE = (24, 15)  # Width and height of random floors
+CHUNKED_CELLS = 256 * 256  # Floors larger than this are made ChunkedLevels
+
+# Serialized layout: header, then each floor as a _FLOOR header followed by
+# its compressed to_bytes(), like compacted floors
+_WORLD = struct.Struct("<IiIIIB")  # seed, floor count (-1 endless), first, floors
+# reached, floors kept, 1 if it uses a level pack
+_FLOOR = struct.Struct("<IBI")  # number, index in _FLOOR_TYPES, size
+_FLOOR_TYPES: Tuple[Type[Level], ...] = (Level, ChunkedLevel)
+
 
 class World:
-    levels: List[Level]
-
-    def __init__(self) -> None:
-        self.levels = [
-            Level.random(),
-            Level.random(),
-            Level.random(),
-            Level.random(),
-            Level.random(),
-            Level.random(),
-        ]
+    """The floors of the spire, from the ground up.
+
+    Floors are generated when first reached, each from its own seed derived
+    from the world's. Only the LIVE_FLOORS most recently used floors, and
+    the hero's, are kept as Level objects; the rest are compacted into
+    compressed bytes, and restored when needed again. Compacted floors far
+    away are dropped (see KEPT_FLOORS), so memory use doesn't grow with the
+    floors reached.
+    """
+
+    seed: int
+    floor_count: Optional[int]  # None for an endless spire
+    floors_reached: int  # Floors generated so far
+    pack: "Optional[levelpack.LevelPack]"
+    first: int
+    _live: "OrderedDict[int, Level]"  # Least recently used first
+    _compacted: Dict[int, Tuple[Type[Level], bytes]]
+
+    def __init__(
+        self,
+        floor_count: Optional[int] = None,
+        pack: "Optional[levelpack.LevelPack]" = None,
+        first: int = 0,
+        endless: Optional[bool] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        """A world with random floors, or floors first... of `pack` if given.
+
+        Random floors come from `seed`; a random one if not given.
+        """
+        if endless if endless is not None else ENDLESS:
+            if pack is not None:
+                raise ValueError("An endless spire can't use a level pack")
+            self.floor_count = None
+        else:
+            self.floor_count = floor_count if floor_count is not None else FLOORS
+        self.pack = pack
+        self.first = first
+        if (
+            pack is not None
+            and self.floor_count is not None
+            and first + self.floor_count > len(pack)
+        ):
+            raise ValueError(
+                f"Level pack has {len(pack)} floors,"
+                f" can't take {self.floor_count} from {first}"
+            )
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self._live = OrderedDict()
+        self._compacted = {}
+        self.floors_reached = 0
+        self._add(self._new_level(0))
+
+    def _new_level(self, number: int) -> Level:
+        if self.pack is not None:
+            level = self.pack.load(self.first + number)
+        else:
+            # Each floor has its own stream, so it's the same whatever
+            # happened before reaching it
+            rng = random.Random(f"{self.seed}/{number}")
+            width, height = LEVEL_SIZE
+            if width * height > CHUNKED_CELLS:
+                level = ChunkedLevel(width, height, seed=rng.getrandbits(32))
+            else:
+                level = Level.random(width, height, rng)
+        level.number = number
+        self.floors_reached = max(self.floors_reached, number + 1)
+        return level
+
+    def _add(self, level: Level, keep: Optional[Level] = None) -> None:
+        """Make `level` live, compacting the least recently used floors.
+
+        Neither `level` nor `keep` (the floor the hero is on) are compacted,
+        even if that leaves more than LIVE_FLOORS live: the game holds on to
+        their Level objects, and changes to a compacted one would be lost.
+        """
+        self._live[level.number] = level
+        pinned = {level.number, keep.number if keep is not None else level.number}
+        for number in list(self._live):
+            if len(self._live) <= LIVE_FLOORS:
+                break
+            if number not in pinned:
+                old = self._live.pop(number)
+                self._compacted[number] = (type(old), zlib.compress(old.to_bytes()))
+        far = [n for n in self._compacted if abs(n - level.number) > KEPT_FLOORS]
+        for n in far:
+            del self._compacted[n]
+
+    def level(self, number: int, keep: Optional[Level] = None) -> Level:
+        """Floor `number`, which must have been reached already.
+
+        `keep` is left live if given (see _add).
+        """
+        level = self._live.get(number)
+        if level is not None:
+            self._live.move_to_end(number)
+            return level
+        if number in self._compacted:
+            cls, data = self._compacted.pop(number)
+            level = cls.from_bytes(zlib.decompress(data))
+            level.number = number
+        else:
+            level = self._new_level(number)
+        self._add(level, keep)
+        return level
+
+    def to_bytes(self) -> bytes:
+        """Serialize the world with its floors, see from_bytes"""
+        return self.serializer()()
+
+    def serializer(self) -> Callable[[], bytes]:
+        """to_bytes() in two steps, see Level.serializer.
+
+        Only the live floors are copied now, and compressed by the function
+        returned; the compacted ones are kept as they are.
+        """
+        compacted = dict(self._compacted)
+        live = {
+            number: (type(level), level.serializer())
+            for number, level in self._live.items()
+        }
+        header = _WORLD.pack(
+            self.seed,
+            self.floor_count if self.floor_count is not None else -1,
+            self.first,
+            self.floors_reached,
+            len(compacted.keys() | live.keys()),
+            self.pack is not None,
+        )
+
+        def serialize() -> bytes:
+            floors = dict(compacted)
+            for number, (cls, level_bytes) in live.items():
+                floors[number] = (cls, zlib.compress(level_bytes()))
+            parts = [header]
+            for number, (cls, data) in floors.items():
+                parts.append(_FLOOR.pack(number, _FLOOR_TYPES.index(cls), len(data)))
+                parts.append(data)
+            return b"".join(parts)
+
+        return serialize
+
+    @classmethod
+    def from_bytes(
+        cls, data: bytes, pack: "Optional[levelpack.LevelPack]" = None
+    ) -> "World":
+        """Inverse of to_bytes. The level pack must be given if one was used.
+
+        Floors are left compacted, and only restored when needed.
+        """
+        self: World = object.__new__(cls)
+        seed, floor_count, first, reached, count, packed = _WORLD.unpack_from(data)
+        if packed and pack is None:
+            raise ValueError("The world was made from a level pack, which is missing")
+        self.seed = seed
+        self.floor_count = floor_count if floor_count >= 0 else None
+        self.pack = pack
+        self.first = first
+        self.floors_reached = reached
+        self._live = OrderedDict()
+        self._compacted = {}
+        pos = _WORLD.size
+        for _ in range(count):
+            number, kind, size = _FLOOR.unpack_from(data, pos)
+            pos += _FLOOR.size
+            if len(data) < pos + size:
+                raise ValueError("Truncated world data")
+            self._compacted[number] = (_FLOOR_TYPES[kind], data[pos : pos + size])
+            pos += size
+        return self
+
+    def live_levels(self) -> List[Level]:
+        """The floors kept as Level objects, least recently used first"""
+        return list(self._live.values())
+
+    def is_live(self, level: Level) -> bool:
+        """True if `level` is still in use, not compacted or replaced"""
+        return self._live.get(level.number) is level
 
     def level_number(self, l: Level) -> int:
-        return self.levels.index(l)
+        return l.number
 
     def level_above(self, l: Level) -> Optional[Level]:
-        i = self.level_number(l)
-        return self.levels[i + 1] if i + 1 < len(self.levels) else None
+        i = l.number + 1
+        if self.floor_count is not None and i >= self.floor_count:
+            return None
+        if i == self.floors_reached:
+            # Upper floors are generated when first reached
+            self._add(self._new_level(i), keep=l)
+        return self.level(i, keep=l)
 
     def level_below(self, l: Level) -> Optional[Level]:
-        i = self.level_number(l)
-        return self.levels[i - 1] if i > 0 else None
+        return self.level(l.number - 1, keep=l) if l.number > 0 else None
@@ -0,0 +1,7 @@
+from pathlib import Path
+import sys
+
+# Setup import path
+sys.path[:0] = [str(Path(__file__).parent.parent / "src")]
+
+import game  # noqa  # Before world, which imports it back
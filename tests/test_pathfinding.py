@@ -0,0 +1,69 @@
+from pathlib import Path
+import random
+
+import pytest
+
+import game
+import pathfinding
+import world
+from world import Direction, Level
+
+# Two ways from the entrance to the exit: along the top row, through a door,
+# or around through the bottom row
+MAP = """\
++-+-+-+-+-+
+|<   #   >|
++ +-+-+-+ +
+|         |
++-+-+-+-+-+
+"""
+
+
+@pytest.fixture
+def level(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Level:
+    (tmp_path / "maps").mkdir()
+    (tmp_path / "maps" / "test.map").write_text(MAP)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(world, "DOOR_TRAP_PROBABILITY", -1)
+    level = Level("test", random.Random(0))
+    for y in range(level.height):
+        for x in range(level.width):
+            level.room(x, y).seen = True
+    return level
+
+
+def test_cost(level: Level) -> None:
+    move = game.MOVE_TIME
+    assert pathfinding.cost(level.room(1, 0)) == move
+    door = level.room(2, 0)
+    assert pathfinding.cost(door) == move + game.BREAK_TIME
+    assert pathfinding.cost(door, key=True) == move + game.UNLOCK_TIME
+    room = level.room(3, 1)
+    room.monster = world.Monster()
+    assert pathfinding.cost(room) == move + pathfinding.AVOID_COST
+    room.seen = False
+    assert pathfinding.cost(room) is None
+
+
+def test_route_around_door(level: Level) -> None:
+    # Around: 6 moves; through: 4 moves and breaking the door
+    field = pathfinding.distance_field(level, level.exit)
+    assert field.distance(level.entrance) == 6 * game.MOVE_TIME
+    assert field.step(level.entrance) == Direction.SOUTH
+    assert len(field.route(level.entrance)) == 6
+
+
+def test_route_through_door_with_key(level: Level) -> None:
+    field = pathfinding.distance_field(level, level.exit, key=True)
+    assert field.distance(level.entrance) == 4 * game.MOVE_TIME + game.UNLOCK_TIME
+    assert field.route(level.entrance) == [Direction.EAST] * 4
+    # The cached field is priced again without the key
+    field = pathfinding.distance_field(level, level.exit)
+    assert field.step(level.entrance) == Direction.SOUTH
+
+
+def test_route_updates(level: Level) -> None:
+    field = pathfinding.distance_field(level, level.exit)
+    assert field.step(level.entrance) == Direction.SOUTH
+    level.room(2, 0).door = None  # Broken
+    assert field.route(level.entrance) == [Direction.EAST] * 4
@@ -0,0 +1,64 @@
+from pathlib import Path
+import random
+from typing import List
+
+import game
+import headless
+from menu import Menu
+import replay
+import world
+
+# Player actions, weighted, for a random player that makes some progress
+ACTIONS = ["north", "south", "east", "west"] * 5 + ["travel", "explore"] * 6
+ACTIONS += ["search", "inventory", "rest"]
+
+
+def record(filename: str, seed: int, actions: int) -> game.Game:
+    """Play a random game, logging it to `filename`"""
+    g = headless.new_game(world=world.World(seed=seed), seed=seed)
+    recorder = replay.Recorder(g, filename)
+    player = random.Random(seed)
+    menus: List[Menu] = []  # Open menus, the one on top last
+    for _ in range(actions):
+        if g.win is not None:
+            break
+        if not menus:
+            action = player.choice(ACTIONS)
+            recorder.record(action)
+            replay.ACTIONS[action](g)
+        else:
+            menu = menus.pop()
+            if not menu.entries:
+                recorder.record(replay.CLOSE)
+            elif player.random() < 0.1:
+                recorder.record(replay.CANCEL)
+                headless.choose(menu, None)
+            else:
+                key = player.choice(menu.entries).key
+                recorder.record(f"{replay.CHOOSE} {key}")
+                headless.choose(menu, key)
+        menus.extend(headless.settle(g))
+    recorder.close()
+    return g
+
+
+def test_replay(tmp_path: Path) -> None:
+    for seed in range(5):
+        filename = str(tmp_path / f"{seed}.log")
+        g = record(filename, seed, 500)
+        log = replay.read(filename)
+        assert log.end == replay.state_hash(g)
+        assert replay.state_hash(replay.play(log)) == log.end
+        # And again, from the same log
+        assert replay.state_hash(replay.play(log)) == log.end
+
+
+def test_replay_cut_short(tmp_path: Path) -> None:
+    filename = tmp_path / "game.log"
+    record(str(filename), 0, 100)
+    lines = filename.read_text().splitlines()
+    filename.write_text("\n".join(lines[:-10]) + "\n")
+    log = replay.read(str(filename))
+    assert log.end is None
+    assert len(log.actions) == len(lines) - 11
+    replay.play(log)
@@ -0,0 +1,97 @@
+from pathlib import Path
+from typing import Callable, List
+
+import pytest
+
+import game
+import headless
+import observer
+import savegame
+import simulation
+import world
+
+SEED = 10  # Gets to the third floor in ACTIONS
+ACTIONS = 400
+
+
+def new_game() -> game.Game:
+    return headless.new_game(world=world.World(seed=SEED), seed=SEED)
+
+
+def play(g: game.Game, after: Callable[[int], None] = lambda i: None) -> None:
+    """Play ACTIONS with simulation.ExplorerPolicy, calling `after` with
+    the number of each one"""
+    policy = simulation.ExplorerPolicy(SEED)
+    for i in range(ACTIONS):
+        menus = headless.settle(g)
+        if menus:
+            for menu in menus:
+                headless.choose(menu, policy.choose(g, menu))
+        else:
+            policy.act(g)
+        after(i)
+    headless.settle(g)
+    assert g.win is None
+
+
+def wait_for_writes() -> None:
+    # Files are written in order, by a single thread
+    savegame._writer.submit(lambda: None).result()
+
+
+def floors(g: game.Game) -> List[bytes]:
+    w = g.world
+    return [w.level(n).to_bytes() for n in range(w.floors_reached)]
+
+
+def assert_same(g: game.Game, loaded: game.Game) -> None:
+    assert savegame.encode_state(loaded) == savegame.encode_state(g)
+    assert loaded.rng.combat.getstate() == g.rng.combat.getstate()
+    assert loaded.rng.loot.getstate() == g.rng.loot.getstate()
+    assert floors(loaded) == floors(g)
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    g = new_game()
+    play(g)
+    filename = str(tmp_path / "game.sav")
+    savegame.save(g, filename).result()
+    assert_same(g, savegame.load(filename))
+
+
+@pytest.mark.parametrize(
+    "compact_size, live_floors",
+    [
+        (2**30, world.LIVE_FLOORS),  # All the changes appended
+        (1024, world.LIVE_FLOORS),  # New snapshots often
+        (2**30, 1),  # Floors compacted as soon as left
+    ],
+    ids=["changes", "snapshots", "compacted"],
+)
+def test_autosave(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, compact_size: int, live_floors: int
+) -> None:
+    monkeypatch.setattr(savegame, "COMPACT_SIZE", compact_size)
+    monkeypatch.setattr(world, "LIVE_FLOORS", live_floors)
+    g = new_game()
+    filename = str(tmp_path / "game.sav")
+    autosave = savegame.Autosave(g, filename)
+
+    def flush(i: int) -> None:
+        if i % 10 == 0:
+            observer.dispatch_events()
+            autosave.flush()
+
+    play(g, flush)
+    autosave.close()
+    wait_for_writes()
+    assert_same(g, savegame.load(filename))
+
+
+def test_load_damaged(tmp_path: Path) -> None:
+    filename = tmp_path / "game.sav"
+    savegame.save(new_game(), str(filename)).result()
+    data = filename.read_bytes()
+    filename.write_bytes(data[: len(data) // 2])
+    with pytest.raises(ValueError):
+        savegame.load(str(filename))